@@ -13,7 +13,7 @@ from typing import List, Dict, Optional, Literal, Any, TypedDict, Annotated, Uni
 import operator
 from datetime import datetime
 import uuid
-from pydantic import BaseModel, Field, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl, field_validator
 
 # --- SECTION 1: Mathematical Guardrails (Semantic Entropy) ---
 class SemanticHealthMetric(BaseModel):
@@ -101,6 +101,7 @@ class CodeChangeArtifact(BaseModel):
     """
     file_path: str = Field(default="")
     diff_content: str = Field(..., description="Git diff format content")
+    affected_files: List[str] = Field(default_factory=list, description="File paths touched by diff_content, parsed once when the artifact is recorded")
     change_type: Literal["ADD", "MODIFY", "DELETE"] = "MODIFY"
     commit_message: Optional[str] = None
     pr_link: Optional[HttpUrl] = None
@@ -118,6 +119,9 @@ class ArchitecturalDecisionRecord(BaseModel):
     consequences: Optional[str] = Field(None, description="Positive and negative consequences")
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
+# Number of feedback entries kept on JulesMetadata across retries.
+MAX_FEEDBACK_LOG = 8
+
 class JulesMetadata(BaseModel):
     """
     Manages the state and lifecycle of the asynchronous Jules-style Engineer Agent.
@@ -127,6 +131,7 @@ class JulesMetadata(BaseModel):
     # Identity & Session Management
     session_id: str = Field(default_factory=lambda: str(uuid.uuid4()), description="Unique session ID for the remote Jules instance")
     external_task_id: Optional[str] = Field(None, description="ID assigned by the external provider (e.g., Google Cloud)")
+    last_payload_digest: Optional[str] = Field(None, description="Digest of the last work order sent, used to skip identical re-dispatches")
 
     # Status Tracking
     # QUEUED: Task received from Orchestrator, waiting for dispatch
@@ -142,6 +147,7 @@ class JulesMetadata(BaseModel):
     current_entropy: float = 0.0
     entropy_history: List[SemanticEntropyReading] = Field(default_factory=list)
     cognitive_tunneling_detected: bool = False
+    last_entropy_key: Optional[str] = Field(None, description="Digest of the prompt/intent/diff behind the latest entropy reading, used to skip re-measuring unchanged work")
 
     # Execution Artifacts
     current_branch: Optional[str] = None
@@ -149,7 +155,7 @@ class JulesMetadata(BaseModel):
     test_results_history: List[TestResult] = Field(default_factory=list)
 
     # Feedback & Control
-    feedback_log: List[str] = Field(default_factory=list, description="Accumulated feedback from QA and Architect")
+    feedback_log: List[str] = Field(default_factory=list, description=f"Most recent feedback from QA and Architect (last {MAX_FEEDBACK_LOG} entries)")
     last_verified_commit: Optional[str] = Field(None, description="The last commit hash that was sent to verification")
     last_verified_pr_number: Optional[int] = Field(None, description="The PR number associated with the last verified commit")
     retry_count: int = 0
@@ -164,6 +170,12 @@ class JulesMetadata(BaseModel):
     # Store the original prompt to allow entropy re-sampling
     current_task_prompt: Optional[str] = None
 
+    @field_validator("feedback_log")
+    @classmethod
+    def _bound_feedback_log(cls, v: List[str]) -> List[str]:
+        """Only the latest entry drives retries, so older feedback is dropped to keep checkpoints small."""
+        return v[-MAX_FEEDBACK_LOG:]
+
     class Config:
         frozen = False  # Mutable state for Pydantic V2 compatibility in LangGraph
         arbitrary_types_allowed = True
@@ -37,6 +37,30 @@ from studio.agents.product_owner import run_po_cycle
 from studio.agents.scrum_master import run_scrum_retrospective
 from studio.agents.optimizer import OptimizerAgent
 from studio.utils.git_utils import sync_main_branch
+from studio.config import get_settings
+
+# Orchestration fields read by the agent helpers; everything else stays out of their dumps.
+_PO_FIELDS = {"task_queue", "sprint_backlog", "completed_tasks_log", "failed_tasks_log"}
+_SCRUM_FIELDS = {"current_sprint_id", "completed_tasks_log", "failed_tasks_log"}
+
+# Conditional-edge maps for the Supergraph, built once at import.
+_ENTRY_ROUTES = {
+    "plan": "product_owner",
+    "execute": "sprint_planning",
+    "interactive_guide": "sop_guide_subgraph",
+    "block": END
+}
+
+_LOOP_ROUTES = {
+    "next": "context_slicer",
+    "done": "scrum_master"
+}
+
+_HEALTH_ROUTES = {
+    "healthy": "backlog_dispatcher",
+    "tunneling": "reflector",
+    "retry": "engineer_subgraph"
+}
 
 # --- MOCK SUBGRAPHS (Placeholders for compilation) ---
 def sop_guide_node(state: SOPState) -> Dict:
@@ -55,7 +79,7 @@ class Orchestrator:
         self.manager = manager
 
         # Initialize the Semantic Sensor
-        self.judge = VertexFlashJudge(GenerativeModel("gemini-2.5-pro"))
+        self.judge = VertexFlashJudge(GenerativeModel("gemini-2.5-pro"), embedding_model_name=get_settings().embedding_model)
         self.calculator = SemanticEntropyCalculator(self.judge)
 
         # Initialize the Worker Subgraphs
@@ -87,12 +111,7 @@ class Orchestrator:
         self.workflow.add_conditional_edges(
             "intent_router",
             self._decide_entry_route,
-            {
-                "plan": "product_owner",
-                "execute": "sprint_planning",
-                "interactive_guide": "sop_guide_subgraph",
-                "block": END
-            }
+            _ENTRY_ROUTES
         )
 
         self.workflow.add_edge("product_owner", "sprint_planning")
@@ -102,10 +121,7 @@ class Orchestrator:
         self.workflow.add_conditional_edges(
             "backlog_dispatcher",
             self._decide_loop_route,
-            {
-                "next": "context_slicer",
-                "done": "scrum_master"
-            }
+            _LOOP_ROUTES
         )
 
         self.workflow.add_edge("context_slicer", "engineer_subgraph")
@@ -114,11 +130,7 @@ class Orchestrator:
         self.workflow.add_conditional_edges(
             "engineer_subgraph",
             self._check_semantic_health,
-            {
-                "healthy": "backlog_dispatcher",
-                "tunneling": "reflector",
-                "retry": "engineer_subgraph"
-            }
+            _HEALTH_ROUTES
         )
 
         self.workflow.add_edge("reflector", END)
@@ -131,8 +143,8 @@ class Orchestrator:
     async def node_product_owner(self, state: StudioState) -> Dict:
         self.logger.info("Orchestrator: Waking up Product Owner Agent...")
         # run_po_cycle analyzes PRODUCT_BLUEPRINT.md
-        # Use model_dump for Pydantic V2 compatibility
-        state_dict = state.model_dump() if hasattr(state, "model_dump") else state.dict()
+        # It only reads the ticket lists, so skip dumping the engineering layer (diffs, logs).
+        state_dict = state.model_dump(include={"orchestration": _PO_FIELDS})
         new_tickets = await asyncio.to_thread(run_po_cycle, state_dict)
 
         orch = state.orchestration
@@ -150,7 +162,7 @@ class Orchestrator:
         into the active sprint_backlog if it is empty.
         """
         self.logger.info("Orchestrator: Sprint Planning Node...")
-        orch = state.orchestration.model_copy(deep=True)
+        orch = state.orchestration
 
         # If sprint_backlog already has active tasks, return unchanged.
         if orch.sprint_backlog:
@@ -162,13 +174,15 @@ class Orchestrator:
 
         if batch:
             self.logger.info(f"Moving {len(batch)} tasks to sprint backlog.")
-            # Remove batch from task_queue
+            # Remove batch from task_queue; all field changes go into a single copy.
             batch_ids = {t.id for t in batch}
-            orch.task_queue = [t for t in orch.task_queue if t.id not in batch_ids]
-            orch.sprint_backlog = batch
-            orch.sprint_goal = f"Execute batch of {len(batch)} tasks."
+            updated_orch = orch.model_copy(update={
+                "task_queue": [t for t in orch.task_queue if t.id not in batch_ids],
+                "sprint_backlog": batch,
+                "sprint_goal": f"Execute batch of {len(batch)} tasks."
+            })
 
-            return {"orchestration": orch}
+            return {"orchestration": updated_orch}
 
         return {}
 
@@ -259,7 +273,7 @@ class Orchestrator:
         Invokes the Scrum Master AND the Optimizer.
         """
         self.logger.info("Orchestrator: Sprint Complete. Engaging Scrum Master...")
-        state_dict = state.model_dump() if hasattr(state, "model_dump") else state.dict()
+        state_dict = state.model_dump(include={"orchestration": _SCRUM_FIELDS})
 
         # 1. Generate Report
         report = await asyncio.to_thread(run_scrum_retrospective, state_dict)
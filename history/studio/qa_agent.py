@@ -47,6 +47,8 @@ class QAAgent:
                 [sys.executable, "-m", "pytest", target],
                 capture_output=True,
                 text=True,
+                # Test output may contain arbitrary bytes; never fail the decode
+                errors="replace",
                 cwd=cwd,
                 env=env
             )
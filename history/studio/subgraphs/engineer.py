@@ -9,10 +9,12 @@ Plan -> Execute -> Monitor (Entropy) -> Verify (TDD) -> Feedback.
 """
 
 import asyncio
+import functools
+import hashlib
 import logging
 import os
 import re
-from typing import Literal, Dict, Any, List
+from typing import Literal, Dict, Any, List, Set
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 
@@ -43,6 +45,10 @@ NOISE_PATTERNS = [
     "https:"
 ]
 
+# Strings that look like project file paths.
+# Avoids matching leading slashes or dots.
+_PATH_REGEX = re.compile(r'(?<![\w/\-.])([\w\-]+(?:/[\w\-]+)*\.(?:py|txt|md|yml|yaml|json|c|h|cpp))')
+
 def is_valid_local_path(path: str) -> bool:
     """
     Validates if a string that looks like a path is a safe, local project path.
@@ -74,6 +80,49 @@ def is_valid_local_path(path: str) -> bool:
 
     return True
 
+def _bulk_create_placeholders(paths: Set[str]) -> Set[str]:
+    """
+    Creates empty placeholder files for every path that does not exist yet.
+    Parent directories are created once per distinct directory rather than once per file.
+
+    Returns:
+        The subset of paths whose placeholder could not be created.
+    """
+    missing = {p for p in paths if not os.path.exists(p)}
+    failed = set()
+
+    for parent in {os.path.dirname(p) for p in missing}:
+        if not parent:
+            continue
+        try:
+            os.makedirs(parent, exist_ok=True)
+        except Exception as e:
+            logger.warning(f"Failed to create directory {parent}: {e}")
+
+    for path in missing:
+        logger.info(f"Task_Dispatcher: Creating placeholder for new file {path}")
+        try:
+            with open(path, "w", encoding="utf-8"):
+                pass # Empty placeholder
+        except Exception as e:
+            logger.warning(f"Failed to create placeholder {path}: {e}")
+            failed.add(path)
+
+    return failed
+
+@functools.lru_cache(maxsize=1)
+def get_jules_client() -> JulesGitHubClient:
+    """
+    Returns the process-wide Jules client.
+    Built once from settings so the GitHub session and repo lookup are reused across nodes.
+    """
+    settings = get_settings()
+    return JulesGitHubClient(
+        github_token=settings.github_token,
+        repo_name=settings.github_repository,
+        jules_username=settings.jules_username
+    )
+
 # --- 1. Task Dispatcher Node ---
 
 async def node_task_dispatcher(state: AgentState) -> Dict[str, Any]:
@@ -105,37 +154,28 @@ async def node_task_dispatcher(state: AgentState) -> Dict[str, Any]:
     # This avoids 'Context Collapse' while ensuring Jules has what it needs.
 
     # Heuristic: Find strings that look like file paths
-    # Improved regex: avoids matching leading slashes or dots
-    path_regex = r'(?<![\w/\-.])([\w\-]+(?:/[\w\-]+)*\.(?:py|txt|md|yml|yaml|json|c|h|cpp))'
-    potential_files = re.findall(path_regex, task_description)
+    potential_files = set(_PATH_REGEX.findall(task_description))
 
     # If it's a retry, we might want to include files mentioned in the feedback too
     if is_retry and jules_data.feedback_log:
-        feedback_files = re.findall(path_regex, jules_data.feedback_log[-1])
-        potential_files.extend(feedback_files)
+        potential_files |= set(_PATH_REGEX.findall(jules_data.feedback_log[-1]))
 
     # Filter and ensure existence (Fix 1 requirement)
-    target_files = []
-    for f in set(potential_files):
+    target_candidates = set()
+    for f in potential_files:
         # Apply strict validation
         if not is_valid_local_path(f):
             logger.info(f"Task_Dispatcher: Skipping invalid path {f}")
             continue
+        target_candidates.add(f)
 
-        if not os.path.exists(f):
-            # If it's a new file task, create empty placeholder so Jules knows where to work
-            logger.info(f"Task_Dispatcher: Creating placeholder for new file {f}")
-            try:
-                dirname = os.path.dirname(f)
-                if dirname:
-                    os.makedirs(dirname, exist_ok=True)
-                with open(f, "w", encoding="utf-8") as f_out:
-                    f_out.write("") # Empty placeholder
-            except Exception as e:
-                logger.warning(f"Failed to create placeholder {f}: {e}")
-                continue
-
-        target_files.append(f)
+    # If it's a new file task, create empty placeholders so Jules knows where to work.
+    # Done in one worker-thread batch to keep filesystem syscalls off the event loop.
+    if target_candidates:
+        failed = await asyncio.to_thread(_bulk_create_placeholders, target_candidates)
+        target_candidates -= failed
+
+    target_files = sorted(target_candidates)
 
     # Fallback to a basic context if nothing identified
     if not target_files:
@@ -157,15 +197,22 @@ async def node_task_dispatcher(state: AgentState) -> Dict[str, Any]:
 
     # 4. Asynchronous Handoff to Remote Jules
     # We use a client wrapper to abstract the A2A or MCP protocol details.[6]
-    settings = get_settings()
-    client = JulesGitHubClient(
-        github_token=settings.github_token,
-        repo_name=settings.github_repository,
-        jules_username=settings.jules_username
-    )
+    client = get_jules_client()
 
     # Ideally, we only start a new task if we aren't already working.
     if jules_data.status == "QUEUED" or is_retry:
+        # Identical work orders (same files, constraints and intent) are not re-sent;
+        # the remote task already holds this exact payload.
+        payload_digest = hashlib.blake2b(
+            repr((context_slice.files, constraints, task_description)).encode(),
+            digest_size=16
+        ).hexdigest()
+
+        if jules_data.external_task_id and payload_digest == jules_data.last_payload_digest:
+            logger.info(f"Task_Dispatcher: Payload unchanged, reusing task {jules_data.external_task_id}")
+            jules_data.status = "WORKING"
+            return {"jules_metadata": jules_data.model_dump(mode='json')}
+
         logger.info(f"Dispatching task to Jules Session {jules_data.session_id}")
 
         # Convert List[str] to Dict[str, str] for TaskPayload
@@ -180,8 +227,9 @@ async def node_task_dispatcher(state: AgentState) -> Dict[str, Any]:
             priority=TaskPriority.MEDIUM
         )
 
-        task_id = client.dispatch_task(payload)
+        task_id = await asyncio.to_thread(client.dispatch_task, payload)
         jules_data.external_task_id = task_id
+        jules_data.last_payload_digest = payload_digest
         jules_data.status = "WORKING"
 
     return {"jules_metadata": jules_data.model_dump(mode='json')}
@@ -204,6 +252,23 @@ async def node_watch_tower(state: AgentState) -> Dict[str, Any]:
 
 # --- 3. Entropy Guard Node (The Cognitive Circuit Breaker) ---
 
+# Sensors are expensive to build (Vertex model init), so one is kept per model name
+# and reused across entropy checks and retries.
+_CALCULATORS: Dict[str, SemanticEntropyCalculator] = {}
+
+async def _get_calculator(model_name: str = "gemini-2.5-flash") -> SemanticEntropyCalculator:
+    """
+    Returns the shared SemanticEntropyCalculator for the given judge model.
+    There is no await between the lookup and the insert, so no lock is needed (an
+    asyncio.Lock would also tie the cache to whichever event loop used it first).
+    """
+    calculator = _CALCULATORS.get(model_name)
+    if calculator is None:
+        judge = VertexFlashJudge(GenerativeModel(model_name), embedding_model_name=get_settings().embedding_model)
+        calculator = _CALCULATORS[model_name] = SemanticEntropyCalculator(judge)
+    return calculator
+
+
 async def node_entropy_guard(state: AgentState) -> Dict[str, Any]:
     """
     Node: Entropy_Guard
@@ -229,31 +294,41 @@ async def node_entropy_guard(state: AgentState) -> Dict[str, Any]:
     # SE measures the uncertainty over *meanings*, not just tokens.
     # High SE means the model is oscillating between semantically distinct options.
 
-    # Initialize the Sensor
-    judge = VertexFlashJudge(GenerativeModel("gemini-2.5-flash"))
-    calculator = SemanticEntropyCalculator(judge)
-
     prompt = jules_data.current_task_prompt or "Unknown Intent"
     intent = jules_data.active_context_slice.intent if jules_data.active_context_slice else "CODING"
-    metric = await calculator.measure_uncertainty(prompt, intent)
 
-    se_score = metric.entropy_score
+    # The same prompt, intent and diff always yield the same verdict, so an unchanged
+    # artifact reuses the latest reading instead of re-sampling the judge.
+    entropy_key = hashlib.blake2b(
+        repr((prompt, intent, traces)).encode(),
+        digest_size=16
+    ).hexdigest()
 
-    logger.info(f"Entropy_Guard: Calculated SE = {se_score}")
+    if entropy_key == jules_data.last_entropy_key and jules_data.entropy_history:
+        reading = jules_data.entropy_history[-1]
+        logger.info(f"Entropy_Guard: Artifact unchanged, reusing SE = {reading.score}")
+    else:
+        # Acquire the (shared) Sensor
+        calculator = await _get_calculator()
+        metric = await calculator.measure_uncertainty(prompt, intent)
+
+        logger.info(f"Entropy_Guard: Calculated SE = {metric.entropy_score}")
+
+        # 2. Update History & Trajectory
+        reading = SemanticEntropyReading(
+            score=metric.entropy_score,
+            threshold=metric.threshold,
+            triggered_breaker=metric.is_tunneling,
+            context_hash=entropy_key,
+            reasoning_trace_summary=str(metric.cluster_distribution)
+        )
+        jules_data.entropy_history.append(reading)
+        jules_data.last_entropy_key = entropy_key
 
-    # 2. Update History & Trajectory
-    reading = SemanticEntropyReading(
-        score=se_score,
-        threshold=metric.threshold,
-        triggered_breaker=metric.is_tunneling,
-        context_hash=str(hash(prompt)),
-        reasoning_trace_summary=str(metric.cluster_distribution)
-    )
-    jules_data.entropy_history.append(reading)
-    jules_data.current_entropy = se_score
+    jules_data.current_entropy = reading.score
 
     # 3. Circuit Breaker Logic
-    if metric.is_tunneling:
+    if reading.triggered_breaker:
         logger.warning("Entropy_Guard: Circuit Breaker TRIPPED! Cognitive Tunneling detected.")
         jules_data.cognitive_tunneling_detected = True
         jules_data.status = "FAILED" # Force failure to trigger Feedback/Reflection
@@ -312,11 +387,12 @@ async def node_architect_gate(state: AgentState) -> Dict[str, Any]:
     if jules_data.active_context_slice and jules_data.active_context_slice.files:
         all_target_files.update(jules_data.active_context_slice.files)
 
-    diff_content = ""
     if jules_data.generated_artifacts:
-        diff_content = jules_data.generated_artifacts[0].diff_content
-        affected_files = extract_affected_files(diff_content)
-        all_target_files.update(affected_files)
+        artifact = jules_data.generated_artifacts[0]
+        # Parse the diff at most once per artifact; the result travels with it.
+        if not artifact.affected_files:
+            artifact.affected_files = extract_affected_files(artifact.diff_content)
+        all_target_files.update(artifact.affected_files)
 
     for filepath in all_target_files:
         try:
@@ -345,12 +421,7 @@ async def node_architect_gate(state: AgentState) -> Dict[str, Any]:
 
     # 3. Handle Verdict
     if jules_data.last_verified_pr_number:
-        settings = get_settings()
-        client = JulesGitHubClient(
-            github_token=settings.github_token,
-            repo_name=settings.github_repository,
-            jules_username=settings.jules_username
-        )
+        client = get_jules_client()
     else:
         client = None
 
@@ -379,7 +450,7 @@ async def node_architect_gate(state: AgentState) -> Dict[str, Any]:
             # Submit a formal REQUEST_CHANGES review on GitHub
             if client and jules_data.last_verified_pr_number:
                 logger.info(f"Architect_Gate: Requesting changes on PR #{jules_data.last_verified_pr_number}")
-                client.review_pr(jules_data.last_verified_pr_number, event="REQUEST_CHANGES", body=feedback)
+                await asyncio.to_thread(client.review_pr, jules_data.last_verified_pr_number, event="REQUEST_CHANGES", body=feedback)
 
             return {
                 "jules_metadata": jules_data.model_dump(mode='json'),
@@ -394,9 +465,9 @@ async def node_architect_gate(state: AgentState) -> Dict[str, Any]:
                 # Implementation of fallback will be in JulesGitHubClient
                 if client and jules_data.last_verified_pr_number:
                     body = "Refactor limit reached. Falling back to Green state with #TODO: Tech Debt."
-                    client.fallback_to_green(jules_data.last_verified_pr_number, jules_data.green_patch)
-                    client.review_pr(jules_data.last_verified_pr_number, event="APPROVE", body=body)
-                    client.merge_pr(jules_data.last_verified_pr_number)
+                    await asyncio.to_thread(client.fallback_to_green, jules_data.last_verified_pr_number, jules_data.green_patch)
+                    await asyncio.to_thread(client.review_pr, jules_data.last_verified_pr_number, event="APPROVE", body=body)
+                    await asyncio.to_thread(client.merge_pr, jules_data.last_verified_pr_number)
 
                 jules_data.status = "COMPLETED"
                 jules_data.is_refactoring = False
@@ -411,9 +482,9 @@ async def node_architect_gate(state: AgentState) -> Dict[str, Any]:
     # Submit a formal APPROVE review then merge the PR
     if client and jules_data.last_verified_pr_number:
         logger.info(f"Architect_Gate: Approving PR #{jules_data.last_verified_pr_number}")
-        client.review_pr(jules_data.last_verified_pr_number, event="APPROVE", body="All checks passed. Merging.")
+        await asyncio.to_thread(client.review_pr, jules_data.last_verified_pr_number, event="APPROVE", body="All checks passed. Merging.")
         logger.info(f"Architect_Gate: Merging PR #{jules_data.last_verified_pr_number}")
-        client.merge_pr(jules_data.last_verified_pr_number)
+        await asyncio.to_thread(client.merge_pr, jules_data.last_verified_pr_number)
 
     return {"jules_metadata": jules_data.model_dump(mode='json')}
 
@@ -480,15 +551,10 @@ async def node_feedback_loop(state: AgentState) -> Dict[str, Any]:
     # (Already updated above)
 
     # 3. Post Feedback to Jules (The Hand)
-    settings = get_settings()
-    client = JulesGitHubClient(
-        github_token=settings.github_token,
-        repo_name=settings.github_repository,
-        jules_username=settings.jules_username
-    )
+    client = get_jules_client()
     if jules_data.external_task_id:
         feedback_to_send = jules_data.feedback_log[-1]
-        client.post_feedback(jules_data.external_task_id, feedback_to_send, is_error=True)
+        await asyncio.to_thread(client.post_feedback, jules_data.external_task_id, feedback_to_send, is_error=True)
 
     # 4. Retry Logic (Self-Correction)
     is_infra_error = False
@@ -526,19 +592,31 @@ async def node_feedback_loop(state: AgentState) -> Dict[str, Any]:
     }
 
 # --- Routing Logic (Conditional Edges) ---
+# Routers only need one or two fields, so they read them straight from the
+# (usually dict-shaped) metadata instead of re-validating a full JulesMetadata.
+
+def _jules_field(state: AgentState, name: str) -> Any:
+    """Reads a single JulesMetadata field from the state without model validation."""
+    meta = state["jules_metadata"]
+    if isinstance(meta, dict):
+        if name in meta:
+            return meta[name]
+        return JulesMetadata.model_fields[name].get_default(call_default_factory=True)
+    return getattr(meta, name)
+
+_WATCH_TOWER_ROUTES = {
+    "BLOCKED": "interrupt_human", # LangGraph interrupt
+    "WORKING": "watch_tower", # Keep polling
+    "QUEUED": "watch_tower",
+    "PLANNING": "watch_tower",
+}
 
 def route_watch_tower(state: AgentState) -> Literal["entropy_guard", "watch_tower", "interrupt_human"]:
     """
     Decides if we should keep polling, interrupt for human input, or proceed.
     """
-    jules_metadata_raw = state["jules_metadata"]
-    jules_data = JulesMetadata(**jules_metadata_raw) if isinstance(jules_metadata_raw, dict) else jules_metadata_raw
-    status = jules_data.status
-    if status == "BLOCKED":
-        return "interrupt_human" # LangGraph interrupt
-    if status in ["WORKING", "QUEUED", "PLANNING"]:
-        return "watch_tower" # Keep polling
-    return "entropy_guard" # Task finished (success or fail), check entropy
+    # Task finished (success or fail), check entropy
+    return _WATCH_TOWER_ROUTES.get(_jules_field(state, "status"), "entropy_guard")
 
 def route_entropy_guard(state: AgentState) -> Literal["architect_gate", "feedback_loop"]:
     """
@@ -546,13 +624,10 @@ def route_entropy_guard(state: AgentState) -> Literal["architect_gate", "feedbac
     Watch_Tower and QA_Verifier are deprecated (Pivot Phase 1); routes directly to
     architect_gate on success, or feedback_loop on failure/tunneling.
     """
-    jules_metadata_raw = state["jules_metadata"]
-    meta = JulesMetadata(**jules_metadata_raw) if isinstance(jules_metadata_raw, dict) else jules_metadata_raw
-
-    if meta.cognitive_tunneling_detected:
+    if _jules_field(state, "cognitive_tunneling_detected"):
         return "feedback_loop" # Immediate circuit break
 
-    if meta.status == "FAILED":
+    if _jules_field(state, "status") == "FAILED":
         return "feedback_loop" # Remote task failed (e.g. build error)
 
     return "architect_gate" # Proceed directly (qa_verifier deprecated)
@@ -561,9 +636,7 @@ def route_qa_verifier(state: AgentState) -> Literal["architect_gate", "feedback_
     """
     Decides if the task is done (proceed to Architect) or needs correction.
     """
-    jules_metadata_raw = state["jules_metadata"]
-    jules_data = JulesMetadata(**jules_metadata_raw) if isinstance(jules_metadata_raw, dict) else jules_metadata_raw
-    if jules_data.status == "COMPLETED":
+    if _jules_field(state, "status") == "COMPLETED":
         return "architect_gate"
     return "feedback_loop"
 
@@ -571,9 +644,7 @@ def route_architect_gate(state: AgentState) -> Literal["end", "feedback_loop"]:
     """
     Decides if the task is architecturally sound.
     """
-    jules_metadata_raw = state["jules_metadata"]
-    jules_data = JulesMetadata(**jules_metadata_raw) if isinstance(jules_metadata_raw, dict) else jules_metadata_raw
-    if jules_data.status == "COMPLETED":
+    if _jules_field(state, "status") == "COMPLETED":
         return "end"
     return "feedback_loop"
 
@@ -582,17 +653,39 @@ def route_feedback_loop(state: AgentState) -> Literal["task_dispatcher", "end"]:
     Decides whether to retry the loop or give up.
     Watch_Tower is deprecated (Pivot Phase 1); WORKING status routes back to task_dispatcher.
     """
-    jules_metadata_raw = state["jules_metadata"]
-    jules_data = JulesMetadata(**jules_metadata_raw) if isinstance(jules_metadata_raw, dict) else jules_metadata_raw
-    if jules_data.status == "QUEUED": # Traditional retry (new task)
+    status = _jules_field(state, "status")
+    if status == "QUEUED": # Traditional retry (new task)
         return "task_dispatcher"
-    if jules_data.status == "WORKING": # Retry: route back to dispatcher (watch_tower deprecated)
+    if status == "WORKING": # Retry: route back to dispatcher (watch_tower deprecated)
         return "task_dispatcher"
     return "end" # Max retries exceeded
 
 # --- Subgraph Builder ---
 
+# Router outcome -> node maps, built once at import. LangGraph copies these into
+# its BranchSpec (it requires a real dict, so they are not wrapped in MappingProxyType).
+_ENTROPY_GUARD_ROUTES = {
+    "architect_gate": "architect_gate",
+    "feedback_loop": "feedback_loop",
+}
+
+_ARCHITECT_GATE_ROUTES = {
+    "end": END,
+    "feedback_loop": "feedback_loop"
+}
+
+_FEEDBACK_LOOP_ROUTES = {
+    "task_dispatcher": "task_dispatcher",
+    "end": END # Escalation
+}
+
+@functools.lru_cache(maxsize=1)
 def build_engineer_subgraph() -> StateGraph:
+    """
+    Builds and compiles the engineer subgraph.
+    The compiled graph holds no per-task state, so it is compiled once per process
+    and shared; call `build_engineer_subgraph.cache_clear()` to force a rebuild.
+    """
     workflow = StateGraph(AgentState)
 
     # Add Nodes (watch_tower and qa_verifier removed in Pivot Phase 1)
@@ -611,28 +704,19 @@ def build_engineer_subgraph() -> StateGraph:
     workflow.add_conditional_edges(
         "entropy_guard",
         route_entropy_guard,
-        {
-            "architect_gate": "architect_gate",
-            "feedback_loop": "feedback_loop",
-        }
+        _ENTROPY_GUARD_ROUTES
     )
 
     workflow.add_conditional_edges(
         "architect_gate",
         route_architect_gate,
-        {
-            "end": END,
-            "feedback_loop": "feedback_loop"
-        }
+        _ARCHITECT_GATE_ROUTES
     )
 
     workflow.add_conditional_edges(
         "feedback_loop",
         route_feedback_loop,
-        {
-            "task_dispatcher": "task_dispatcher",
-            "end": END # Escalation
-        }
+        _FEEDBACK_LOOP_ROUTES
     )
 
     return workflow.compile()
@@ -15,9 +15,11 @@ Reference:
 """
 
 import math
+import re
 import logging
 import asyncio
-from typing import List, Dict, Tuple, Protocol
+from typing import List, Dict, Tuple, Protocol, Optional
+import numpy as np
 # Import strict schema from the Studio Memory
 from studio.memory import SemanticHealthMetric
 
@@ -29,6 +31,36 @@ ENTROPY_THRESHOLD = 7.0  # If SE > 7.0, uncertainty is too high (Tunneling/Confa
 # Note: Threshold depends on N. For N=5, max entropy is log2(5) ~= 2.32.
 # 7.0 is chosen to prevent false positives from normal variance, as per rules.md 4.2.
 
+# -p*log2(p) for every possible cluster size k at the default sample size (p = k/N).
+_DEFAULT_ENTROPY_TERMS = {
+    k: -(k / DEFAULT_SAMPLE_SIZE) * math.log2(k / DEFAULT_SAMPLE_SIZE)
+    for k in range(1, DEFAULT_SAMPLE_SIZE + 1)
+}
+
+# Embeddings only prefilter the entailment checks: a pair below BORDERLINE cosine similarity
+# is treated as different without asking the judge. Anything closer still goes to NLI, since
+# answers that differ in one register value or config flag can embed almost identically.
+SIMILARITY_BORDERLINE = 0.80
+
+_WHITESPACE_RE = re.compile(r"\s+")
+# Characters the judge may put in front of its TRUE/FALSE verdict (markdown, quotes).
+_VERDICT_PADDING = " \t\r\n*`'\"."
+
+# NLI judge calls only need the first token of the verdict. Thinking models count thought
+# tokens against max_output_tokens, so thinking is switched off for the one-token request.
+_NLI_GENERATION_CONFIG = {
+    "temperature": 0.0,
+    "max_output_tokens": 1,
+    "stop_sequences": ["\n"],
+    "thinking_config": {"thinking_budget": 0},
+}
+# Used when a model rejects the above (e.g. thinking cannot be disabled) or returns no verdict.
+_NLI_UNCAPPED_CONFIG = {"temperature": 0.0}
+
+def _normalize(text: str) -> str:
+    """Whitespace- and case-insensitive form used to spot duplicate samples."""
+    return _WHITESPACE_RE.sub(" ", text).strip().casefold()
+
 # --- SECTION 1: The Abstraction (LLM Client) ---
 
 class LLMJudge(Protocol):
@@ -47,6 +79,13 @@ class LLMJudge(Protocol):
         """
         ...
 
+    async def embed_samples(self, samples: List[str]) -> Optional[np.ndarray]:
+        """
+        Embeds the samples as an (N, D) matrix.
+        Returns None if the judge has no embedding model (every pair then goes to entailment).
+        """
+        ...
+
 # --- SECTION 2: The Core Logic (Semantic Entropy) ---
 
 class SemanticEntropyCalculator:
@@ -57,6 +96,7 @@ class SemanticEntropyCalculator:
 
     def __init__(self, llm_client: LLMJudge):
         self.llm = llm_client
+        self._embeddings_supported = True
 
     async def measure_uncertainty(self, prompt: str, context_intent: str) -> SemanticHealthMetric:
         """
@@ -89,29 +129,69 @@ class SemanticEntropyCalculator:
     async def _cluster_responses(self, samples: List[str], intent: str) -> List[List[str]]:
         """
         Groups responses into semantic clusters.
-        Logic: A greedy clustering algorithm using the LLM as a comparator.
+        Entailment decides membership; when the judge supports embeddings, one embedding
+        pass rules out clearly different pairs so they cost no LLM call.
         """
-        clusters: List[List[str]] = []
-
-        for sample in samples:
-            matched_cluster = False
-
-            # Compare current sample against the representative (first item) of existing clusters
-            for cluster in clusters:
-                representative = cluster[0]
+        embeddings = await self._embed(samples)
+        return await self._cluster_by_entailment(samples, intent, embeddings)
 
-                # The "Flash Judge" Check
-                # Does Sample == Representative (in meaning)?
-                is_equivalent = await self.llm.check_entailment(sample, representative, intent)
-
-                if is_equivalent:
-                    cluster.append(sample)
-                    matched_cluster = True
-                    break
+    async def _embed(self, samples: List[str]) -> Optional[np.ndarray]:
+        """
+        Returns L2-normalized (N, D) sample embeddings, or None if unavailable.
+        A failing embedding model is not retried for the rest of this calculator's life.
+        """
+        embed_samples = getattr(self.llm, "embed_samples", None)
+        if embed_samples is None or not self._embeddings_supported:
+            return None
+        try:
+            embeddings = np.asarray(await embed_samples(samples), dtype=float)
+        except Exception as e:
+            logger.warning(f"Embedding failed, using pairwise entailment from now on: {e}")
+            self._embeddings_supported = False
+            return None
+        if embeddings.ndim != 2 or embeddings.shape[0] != len(samples):
+            return None
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return embeddings / norms
+
+    async def _cluster_by_entailment(self, samples: List[str], intent: str,
+                                     embeddings: Optional[np.ndarray] = None) -> List[List[str]]:
+        """
+        Greedy clustering using the LLM as a comparator.
+        With embeddings, clusters whose representative is below SIMILARITY_BORDERLINE are skipped.
+        """
+        clusters: List[List[str]] = []
+        normalized_reps: List[str] = []
+        representatives: List[int] = []
+
+        for i, sample in enumerate(samples):
+            # Fast path: textually identical samples need no LLM judgement
+            normalized = _normalize(sample)
+            if normalized in normalized_reps:
+                clusters[normalized_reps.index(normalized)].append(sample)
+                continue
+
+            candidates = range(len(clusters))
+            if embeddings is not None:
+                candidates = [c for c in candidates if embeddings[i] @ embeddings[representatives[c]] >= SIMILARITY_BORDERLINE]
+
+            # Compare current sample against the representative (first item) of the candidate
+            # clusters concurrently: the "Flash Judge" checks are independent of each other.
+            results = await asyncio.gather(*(
+                self.llm.check_entailment(sample, clusters[c][0], intent) for c in candidates
+            ))
 
-            # If no match, start a new semantic cluster
-            if not matched_cluster:
+            # Join the first equivalent cluster (same choice as a sequential scan)
+            match = next((c for c, is_equivalent in zip(candidates, results) if is_equivalent), None)
+            if match is not None:
+                clusters[match].append(sample)
+            else:
+                # If no match, start a new semantic cluster
                 clusters.append([sample])
+                normalized_reps.append(normalized)
+                representatives.append(i)
 
         return clusters
 
@@ -122,20 +202,21 @@ class SemanticEntropyCalculator:
         if total_samples == 0:
             return 0.0, {}
 
-        entropy = 0.0
-        distribution = {}
-
-        for i, cluster in enumerate(clusters):
-            count = len(cluster)
-            probability = count / total_samples
-
-            # Shannon Entropy Formula
-            entropy -= probability * math.log2(probability)
-
-            # Log the distribution for debugging (e.g., "Meaning A": 0.6, "Meaning B": 0.4)
-            # We use the first 50 chars of the representative as the key
-            key = f"Cluster_{i}: {cluster[0][:50]}..."
-            distribution[key] = probability
+        # Shannon Entropy Formula: table lookup for the default sample size,
+        # vectorized NumPy for larger N.
+        if total_samples == DEFAULT_SAMPLE_SIZE:
+            entropy = sum(_DEFAULT_ENTROPY_TERMS[len(cluster)] for cluster in clusters)
+        else:
+            counts = np.fromiter((len(cluster) for cluster in clusters), dtype=float, count=len(clusters))
+            probs = counts / total_samples
+            entropy = float(-(probs * np.log2(probs)).sum())
+
+        # Log the distribution for debugging (e.g., "Meaning A": 0.6, "Meaning B": 0.4)
+        # We use the first 50 chars of the representative as the key
+        distribution = {
+            f"Cluster_{i}: {cluster[0][:50]}...": len(cluster) / total_samples
+            for i, cluster in enumerate(clusters)
+        }
 
         return entropy, distribution
 
@@ -156,12 +237,29 @@ class VertexFlashJudge:
     Concrete implementation of LLMJudge using Vertex AI (Gemini 1.5 Flash).
     Optimized for speed and cost.
     """
-    def __init__(self, vertex_model):
+    def __init__(self, vertex_model, embedding_model_name: Optional[str] = None):
         self.model = vertex_model # e.g., GenerativeModel("gemini-2.5-flash")
+        self.embedding_model_name = embedding_model_name
+        self._embedder = None
+        self._logprobs_supported = True
+        self._one_token_supported = True
 
     async def generate_samples(self, prompt: str, n: int, temperature: float = 0.7) -> List[str]:
-        # Note: In production, use asyncio.gather for parallel calls
-        # or the 'candidate_count' parameter if supported.
+        # Preferred path: a single request returning N candidates.
+        try:
+            response = await self.model.generate_content_async(
+                prompt,
+                generation_config={"temperature": temperature, "candidate_count": n}
+            )
+            samples = [c.content.parts[0].text for c in response.candidates if c.content.parts]
+        except Exception as e:
+            logger.warning(f"candidate_count sampling failed, falling back to parallel calls: {e}")
+            samples = []
+
+        if len(samples) == n:
+            return samples
+
+        # Fallback: models without candidate_count support get N parallel calls.
         tasks = []
         for _ in range(n):
             tasks.append(self.model.generate_content_async(
@@ -175,6 +273,7 @@ class VertexFlashJudge:
     async def check_entailment(self, text_a: str, text_b: str, context: str) -> bool:
         """
         Uses a specialized NLI prompt to check meaning.
+        The verdict is a single token (T/F); its log-probabilities decide when available.
         """
         nli_prompt = f"""
         You are a Semantic Logic Judge.
@@ -186,13 +285,95 @@ class VertexFlashJudge:
         Task: Do these two statements mean EXACTLY the same thing regarding the intent?
         Ignore minor phrasing differences. Focus on the core logic and facts.
 
-        Answer strictly: TRUE or FALSE.
+        Answer with a single letter and nothing else: T (same meaning) or F (different meaning).
         """
 
-        response = await self.model.generate_content_async(
-            nli_prompt,
-            generation_config={"temperature": 0.0} # Deterministic
-        )
+        if self._one_token_supported:
+            try:
+                response = await self._request_one_token_verdict(nli_prompt)
+            except Exception as e:
+                logger.warning(f"One-token verdicts unavailable for the judge model, using full answers: {e}")
+                self._one_token_supported = False
+            else:
+                verdict = self._verdict_from_logprobs(response)
+                if verdict is None:
+                    verdict = self._verdict_from_text(response)
+                if verdict is not None:
+                    return verdict
+                # Empty candidate (e.g. the token budget went to thinking): ask again without the cap
+
+        response = await self.model.generate_content_async(nli_prompt, generation_config=dict(_NLI_UNCAPPED_CONFIG))
+        verdict = self._verdict_from_text(response)
+        if verdict is None:
+            logger.warning("Judge returned no verdict; treating the statements as not equivalent.")
+            return False
+        return verdict
+
+    async def _request_one_token_verdict(self, nli_prompt: str):
+        """Requests the single verdict token, with its logprobs while the model supports them."""
+        generation_config = dict(_NLI_GENERATION_CONFIG) # Deterministic, one token
+        if self._logprobs_supported:
+            generation_config.update(response_logprobs=True, logprobs=2)
+
+        try:
+            return await self.model.generate_content_async(nli_prompt, generation_config=generation_config)
+        except Exception as e:
+            if not self._logprobs_supported:
+                raise
+            # Models without logprobs support reject the request; stop asking for them.
+            logger.warning(f"Logprobs unavailable for the judge model, using text verdicts: {e}")
+            self._logprobs_supported = False
+            return await self.model.generate_content_async(nli_prompt, generation_config=dict(_NLI_GENERATION_CONFIG))
+
+    @staticmethod
+    def _verdict_from_text(response) -> Optional[bool]:
+        """
+        Reads the (SDK-assembled) text once and only looks at the leading verdict, so an
+        explanation like "FALSE, not TRUE because..." is not misread.
+        Returns None if the response has no text (no candidates/parts, or blocked).
+        """
+        try:
+            text = response.text
+        except (ValueError, AttributeError, IndexError):
+            return None
+        verdict = text.lstrip(_VERDICT_PADDING)[:1].upper() if isinstance(text, str) else ""
+        if not verdict:
+            return None
+        return verdict == "T"
+
+    @staticmethod
+    def _verdict_from_logprobs(response) -> Optional[bool]:
+        """
+        Compares P(T) and P(F) over the first token's top candidates.
+        Returns None if the response carries no usable logprobs.
+        """
+        try:
+            top = response.candidates[0].logprobs_result.top_candidates[0].candidates
+            p_true = p_false = 0.0
+            for candidate in top:
+                token = candidate.token.lstrip(_VERDICT_PADDING)[:1].upper()
+                if token == "T":
+                    p_true += math.exp(candidate.log_probability)
+                elif token == "F":
+                    p_false += math.exp(candidate.log_probability)
+        except (AttributeError, IndexError, TypeError):
+            return None
+
+        if p_true == p_false == 0.0:
+            return None
+        return p_true > p_false
+
+    async def embed_samples(self, samples: List[str]) -> Optional[np.ndarray]:
+        """
+        Embeds all samples in one batched call.
+        Returns None when no embedding model is configured.
+        """
+        if not self.embedding_model_name:
+            return None
+
+        if self._embedder is None:
+            from langchain_google_vertexai import VertexAIEmbeddings
+            self._embedder = VertexAIEmbeddings(model_name=self.embedding_model_name)
 
-        clean_resp = response.text.strip().upper()
-        return "TRUE" in clean_resp
+        vectors = await self._embedder.aembed_documents(samples)
+        return np.asarray(vectors, dtype=float)
@@ -1,87 +1,87 @@
+import os
 import subprocess
 import logging
 
 logger = logging.getLogger("studio.utils.git_utils")
 
+# Each sync runs as a single shell process instead of one fork/exec per git step.
+# The network fetch runs in the background while the local stash (and checkout of
+# main) proceed; `wait` joins it before anything that needs the fetched refs.
+# The stash may fail (nothing to stash) without aborting; every later step is
+# chained with && so the first failure stops the sequence and sets the exit code.
+# Branch names are passed as "$1", never interpolated into the script text.
+_CHECKOUT_PR_SCRIPT = "\n".join((
+    'git fetch origin & fetch=$!',
+    'git stash',
+    'wait "$fetch" && '
+    'git checkout "$1" && '
+    'git reset --hard "origin/$1" && '  # Mirror origin exactly, avoiding the "Checkout Trap"
+    'git clean -fd',
+))
+
+_SYNC_MAIN_SCRIPT = "\n".join((
+    'git fetch origin main & fetch=$!',
+    'git stash',
+    'git checkout main || { wait "$fetch"; exit 1; }',
+    'wait "$fetch" && '
+    'git reset --hard origin/main && '
+    'git clean -fd',
+))
+
+# Applied to every git command in a script: skip optional index locks (fewer clashes
+# with editors/IDEs running git), never prompt for credentials, and keep fsmonitor
+# and auto-gc maintenance out of the sync path. Config is passed via GIT_CONFIG_*
+# so it reaches each command without repeating `-c` flags.
+_GIT_ENV = {
+    "GIT_OPTIONAL_LOCKS": "0",
+    "GIT_TERMINAL_PROMPT": "0",
+}
+_GIT_CONFIG = (
+    ("core.fsmonitor", "false"),
+    ("gc.auto", "0"),
+)
+
+def _git_env() -> dict:
+    """The caller's environment plus _GIT_ENV, with _GIT_CONFIG appended after any GIT_CONFIG_* entries it already sets."""
+    env = {**os.environ, **_GIT_ENV}
+    count = int(env.get("GIT_CONFIG_COUNT") or 0)
+    for index, (key, value) in enumerate(_GIT_CONFIG, start=count):
+        env[f"GIT_CONFIG_KEY_{index}"] = key
+        env[f"GIT_CONFIG_VALUE_{index}"] = value
+    env["GIT_CONFIG_COUNT"] = str(count + len(_GIT_CONFIG))
+    return env
+
+def _run_git_script(script: str, *args: str) -> subprocess.CompletedProcess:
+    """Runs a git command sequence in one `sh -c` invocation; positional args become $1, $2, ..."""
+    return subprocess.run(
+        ["sh", "-c", script, "git_utils", *args],
+        check=True,
+        env=_git_env()
+    )
+
 def checkout_pr_branch(branch_name: str):
     """
     Safely stashes local changes, fetches the latest remote branches,
     and checks out the target branch.
+    Executes: (git fetch origin in parallel with git stash) && git checkout <branch> && git reset --hard origin/<branch> && git clean -fd
     """
     logger.info(f"Checking out PR branch: {branch_name}")
 
-    # 1. Stash any local changes (ignore failure if nothing to stash)
     try:
-        subprocess.run(["git", "stash"], check=False)
-    except Exception as e:
-        logger.warning(f"Git stash failed (likely nothing to stash): {e}")
-
-    # 2. Fetch from origin
-    try:
-        subprocess.run(["git", "fetch", "origin"], check=True)
+        _run_git_script(_CHECKOUT_PR_SCRIPT, branch_name)
     except subprocess.CalledProcessError as e:
-        logger.error(f"Git fetch origin failed: {e}")
-        raise
-
-    # 3. Checkout the target branch
-    try:
-        subprocess.run(["git", "checkout", branch_name], check=True)
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Git checkout {branch_name} failed: {e}")
-        raise
-
-    # 4. Force synchronization with origin (Hard Reset)
-    # This ensures local branch perfectly mirrors origin, avoiding "Checkout Trap"
-    try:
-        subprocess.run(["git", "reset", "--hard", f"origin/{branch_name}"], check=True)
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Git reset --hard origin/{branch_name} failed: {e}")
-        raise
-
-    # 5. Clean untracked files
-    try:
-        subprocess.run(["git", "clean", "-fd"], check=True)
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Git clean -fd failed: {e}")
+        logger.error(f"Git checkout of PR branch {branch_name} failed: {e}")
         raise
 
 def sync_main_branch():
     """
     Synchronizes the local main branch with the remote origin.
-    Executes: git stash && git checkout main && git fetch origin main && git reset --hard origin/main && git clean -fd
+    Executes: (git fetch origin main in parallel with git stash; git checkout main) && git reset --hard origin/main && git clean -fd
     """
     logger.info("Synchronizing local workspace with main branch.")
 
-    # 0. Stash local changes
-    try:
-        subprocess.run(["git", "stash"], check=False)
-    except Exception as e:
-        logger.warning(f"Git stash failed: {e}")
-
-    # 1. Checkout main
-    try:
-        subprocess.run(["git", "checkout", "main"], check=True)
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Git checkout main failed: {e}")
-        raise
-
-    # 2. Fetch from origin main
-    try:
-        subprocess.run(["git", "fetch", "origin", "main"], check=True)
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Git fetch origin main failed: {e}")
-        raise
-
-    # 3. Force synchronization with origin/main
-    try:
-        subprocess.run(["git", "reset", "--hard", "origin/main"], check=True)
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Git reset --hard origin/main failed: {e}")
-        raise
-
-    # 4. Clean untracked files
     try:
-        subprocess.run(["git", "clean", "-fd"], check=True)
+        _run_git_script(_SYNC_MAIN_SCRIPT)
     except subprocess.CalledProcessError as e:
-        logger.error(f"Git clean -fd failed: {e}")
+        logger.error(f"Git sync of main branch failed: {e}")
         raise
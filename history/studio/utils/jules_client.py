@@ -14,8 +14,17 @@ Dependencies:
 - pydantic
 """
 
+import json
 import logging
-from typing import Protocol, List, Dict, Optional, Literal
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+from urllib.parse import quote
+from typing import Protocol, List, Dict, Optional, Literal, Tuple, Any, Iterator
 from enum import Enum
 from pydantic import BaseModel, Field, SecretStr
 
@@ -28,6 +37,101 @@ except ImportError:
 
 logger = logging.getLogger("studio.utils.jules_client")
 
+# One GraphQL round trip returns the issue state and the PR fields get_status needs,
+# instead of REST get_issue + a paginated timeline walk + a get_pull (kept as the fallback).
+# Further timeline pages are only requested while no PR source has been seen.
+_ISSUE_STATUS_QUERY = """
+query($owner: String!, $name: String!, $number: Int!, $after: String) {
+  repository(owner: $owner, name: $name) {
+    issue(number: $number) {
+      state
+      timelineItems(itemTypes: [CROSS_REFERENCED_EVENT], first: 100, after: $after) {
+        pageInfo {
+          hasNextPage
+          endCursor
+        }
+        nodes {
+          ... on CrossReferencedEvent {
+            source {
+              ... on PullRequest {
+                repository {
+                  nameWithOwner
+                }
+                number
+                state
+                url
+                headRefName
+                headRefOid
+                additions
+                deletions
+              }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+# Polls within this window reuse the previous WorkStatus instead of hitting GitHub.
+STATUS_CACHE_TTL = 30.0
+
+# Conditional-request validators kept per URL; 304 replies do not count against the REST quota.
+ETAG_CACHE_SIZE = 256
+# raw_diff only feeds entropy sampling; huge PRs are capped rather than held in full.
+MAX_RAW_DIFF_CHARS = 512 * 1024
+_FILES_PER_PAGE = 100
+# Pages after the first are independent and fetched concurrently.
+_MAX_PAGE_WORKERS = 4
+_LAST_PAGE_RE = re.compile(r'[?&]page=(\d+)[^>]*>;\s*rel="last"')
+
+# Lines of a GitHub patch that lack a valid diff prefix (context lines whose leading
+# space was dropped, including empty ones).
+_MISSING_PREFIX_RE = re.compile(r"^(?![-+\\ ]|@@)", re.MULTILINE)
+
+def _fix_patch(patch: str) -> str:
+    """
+    Fixes malformed patches from GitHub (missing leading spaces on context lines).
+    Lines without a diff prefix get a leading space; the scan is one regex pass.
+    """
+    return _MISSING_PREFIX_RE.sub(" ", "\n".join(patch.splitlines())) + "\n"
+
+_RAW_MEDIA_TYPE = "application/vnd.github.raw+json"
+
+# GraphQL PullRequest states -> WorkStatus
+_PR_STATUS_MAP = {
+    "OPEN": "REVIEW_READY",
+    "CLOSED": "COMPLETED", # Merged or closed
+    "MERGED": "COMPLETED",
+}
+
+# Markdown template optimized for Code Agents (filled by _construct_issue_body)
+_ISSUE_BODY_TEMPLATE = """
+@{user} **Action Required**
+
+### 🎯 Intent
+{intent}
+
+### 📂 Context
+* **Task ID:** `{task_id}`
+* **Focus Files:**
+{files}
+
+### 📜 Constraints (MUST FOLLOW)
+{constraints}
+
+### 🔍 Relevant Logs / Evidence
+```text
+{logs}
+
+```
+
+---
+
+*Generated by AI Agent Studio (Orchestrator)*
+"""
+
 # --- SECTION 1: Data Models ( The Nerve Signals ) ---
 
 class TaskPriority(str, Enum):
@@ -104,21 +208,33 @@ class JulesGitHubClient:
         if not Github:
             raise ImportError("PyGithub is required. Run `pip install PyGithub`.")
 
-        self.gh = Github(github_token.get_secret_value())
+        # 100 items per page (GitHub's max) halves pagination round trips vs the default 30
+        self._github_token = github_token
+        self.gh = Github(github_token.get_secret_value(), per_page=100)
         self.repo_name = repo_name
         self.jules_username = jules_username
-        self._repo_cache: Optional[Repository.Repository] = None
-
-    @property
+        self._issue_cache: Dict[int, Issue.Issue] = {}
+        self._linked_pr_cache: Dict[int, PullRequest.PullRequest] = {}
+        self._status_cache: Dict[str, Tuple[float, WorkStatus]] = {}
+        self._status_ttl = STATUS_CACHE_TTL
+        self._terminal_status: Dict[str, WorkStatus] = {}
+        self._etag_cache: "OrderedDict[Tuple[str, Tuple], Tuple[str, Any, Dict[str, Any]]]" = OrderedDict()
+        self._etag_lock = threading.Lock()
+
+        # PyGithub requesters share one connection object that holds per-request state,
+        # so concurrent page fetches each use their own session on a long-lived worker
+        # thread; the threads (and their keep-alive connections) are reused across polls.
+        self._page_pool: Optional[ThreadPoolExecutor] = None
+        self._worker_local = threading.local()
+
+    @cached_property
     def repo(self) -> Repository.Repository:
-        """Lazy load the repo object."""
-        if not self._repo_cache:
-            try:
-                self._repo_cache = self.gh.get_repo(self.repo_name)
-            except GithubException as e:
-                logger.error(f"Failed to access repo {self.repo_name}: {e}")
-                raise
-        return self._repo_cache
+        """Lazy load the repo object; stored on the instance after the first success."""
+        try:
+            return self.gh.get_repo(self.repo_name)
+        except GithubException as e:
+            logger.error(f"Failed to access repo {self.repo_name}: {e}")
+            raise
 
     def dispatch_task(self, payload: TaskPayload) -> str:
         """
@@ -144,66 +260,60 @@ class JulesGitHubClient:
             logger.error(f"Failed to create issue for task {payload.task_id}: {e}")
             raise
 
-    def get_status(self, external_id: str) -> WorkStatus:
+    def get_status(self, external_id: str, force: bool = False) -> WorkStatus:
         """
         Polls the Issue to see if Jules has opened a PR.
+        Repeated polls within the TTL return the cached status, and a COMPLETED status is
+        returned from memory for good, unless `force` is set.
         """
+        if not force:
+            terminal = self._terminal_status.get(external_id)
+            if terminal is not None:
+                return terminal
+
+            cached = self._status_cache.get(external_id)
+            if cached and time.monotonic() - cached[0] < self._status_ttl:
+                return cached[1]
+
+        status = self._fetch_status(external_id)
+        if status.status == "COMPLETED":
+            # A merged/closed PR's head, stats and files no longer change
+            self._terminal_status[external_id] = status
+            self._status_cache.pop(external_id, None)
+        elif status.status == "BLOCKED":
+            # Errors and closed issues are always re-checked on the next poll
+            self._status_cache.pop(external_id, None)
+        else:
+            self._status_cache[external_id] = (time.monotonic(), status)
+        return status
+
+    def _fetch_status(self, external_id: str) -> WorkStatus:
+        """Builds a fresh WorkStatus from GitHub."""
         issue_number = int(external_id)
         try:
-            # 1. Get the Issue
-            issue = self.repo.get_issue(issue_number)
-
-            # 2. Check for Linked PRs
-            # GitHub usually links PRs in the timeline or via specific events.
-            # A robust way is to search for PRs referencing this issue.
-            pr = self._find_linked_pr(issue)
+            # 1. Get the Issue state and its linked PR in a single query
+            # GitHub links PRs in the timeline via cross-reference events.
+            issue_state, pr = self._query_issue_status(issue_number)
 
             if not pr:
                 # Still working or queued
                 return WorkStatus(
                     tracking_id=external_id,
-                    status="WORKING" if issue.state == "open" else "BLOCKED"
+                    status="WORKING" if issue_state == "OPEN" else "BLOCKED"
                 )
 
-            # 3. If PR exists, get its details
+            # 2. If PR exists, fetch the diff for Entropy Calculation
             # We assume if a PR is open, it's ready for review (by us/Orchestrator)
-            status_map = {
-                "open": "REVIEW_READY",
-                "closed": "COMPLETED", # Merged or closed
-            }
-
-            # Fetch the diff for Entropy Calculation
-            # Note: For massive diffs, we might need to truncate or fetch file-by-file
-            diff_files = list(pr.get_files())
-
-            diff_parts = []
-            for f in diff_files:
-                if not f.patch:
-                    continue
-
-                # Fix malformed patches from GitHub (missing leading spaces on context lines)
-                fixed_patch = []
-                for line in f.patch.splitlines():
-                    if line.startswith(('+', '-', '@@', '\\', ' ')):
-                        fixed_patch.append(line)
-                    elif not line:
-                        fixed_patch.append(' ')
-                    else:
-                        fixed_patch.append(' ' + line)
-
-                patch_content = "\n".join(fixed_patch) + "\n"
-                diff_parts.append(f"--- a/{f.filename}\n+++ b/{f.filename}\n{patch_content}")
-
-            diff_text = "".join(diff_parts)
+            diff_text = self._build_raw_diff(pr["number"])
 
             return WorkStatus(
                 tracking_id=external_id,
-                status=status_map.get(pr.state, "WORKING"),
-                linked_pr_number=pr.number,
-                branch_name=pr.head.ref,
-                pr_url=pr.html_url,
-                last_commit_hash=pr.head.sha,
-                diff_stat=f"+{pr.additions}/-{pr.deletions}",
+                status=_PR_STATUS_MAP.get(pr["state"], "WORKING"),
+                linked_pr_number=pr["number"],
+                branch_name=pr["headRefName"],
+                pr_url=pr["url"],
+                last_commit_hash=pr["headRefOid"],
+                diff_stat=f"+{pr['additions']}/-{pr['deletions']}",
                 raw_diff=diff_text
             )
 
@@ -219,10 +329,8 @@ class JulesGitHubClient:
         """
         try:
             issue_number = int(external_id)
-            issue = self.repo.get_issue(issue_number)
-
             # 1. Detect if a linked PR exists
-            pr = self._find_linked_pr(issue)
+            pr = self._find_linked_pr(issue_number)
 
             # 2. Construct comment body with explicit tagging
             # Use a newline after the tag for better Markdown rendering
@@ -235,7 +343,7 @@ class JulesGitHubClient:
                 pr.create_issue_comment(comment_body)
                 location = f"PR #{pr.number}"
             else:
-                issue.create_comment(comment_body)
+                self._get_issue(issue_number).create_comment(comment_body)
                 location = f"Issue #{issue_number}"
 
             logger.info(f"Posted feedback to {location}")
@@ -308,8 +416,7 @@ class JulesGitHubClient:
             original_files = {}
             for path in affected_paths:
                 try:
-                    file_content = self.repo.get_contents(path, ref=base_sha)
-                    original_files[path] = file_content.decoded_content.decode("utf-8")
+                    original_files[path] = self._get_file_text(path, ref=base_sha)
                 except GithubException:
                     # File might be new in the PR
                     original_files[path] = ""
@@ -351,50 +458,235 @@ class JulesGitHubClient:
         """
         Formats the prompt for the AI Employee.
         """
-        # Markdown template optimized for Code Agents
-        return f"""
-@{self.jules_username} **Action Required**
+        return _ISSUE_BODY_TEMPLATE.format(
+            user=self.jules_username,
+            intent=payload.intent,
+            task_id=payload.task_id,
+            files=self._format_file_list(payload.context_files),
+            constraints=self._format_constraints(payload.constraints),
+            logs=payload.relevant_logs or "No logs provided.",
+        )
 
-### 🎯 Intent
-{payload.intent}
+    def _format_file_list(self, files: Dict[str, str]) -> str:
+        if not files: return "_No specific files identified._"
+        return "\n".join([f"- `{path}`: {desc}" for path, desc in files.items()])
 
-### 📂 Context
-* **Task ID:** `{payload.task_id}`
-* **Focus Files:**
-{self._format_file_list(payload.context_files)}
+    def _format_constraints(self, constraints: List[str]) -> str:
+        if not constraints: return "_No specific constraints._"
+        return "\n".join([f"- [ ] {c}" for c in constraints])
 
-### 📜 Constraints (MUST FOLLOW)
-{self._format_constraints(payload.constraints)}
+    def _get_issue(self, issue_number: int) -> Issue.Issue:
+        """
+        Issue handle for posting comments; one lookup per issue suffices. The object's
+        fields (state, labels, ...) are never refreshed, so status reads must not use it.
+        """
+        issue = self._issue_cache.get(issue_number)
+        if issue is None:
+            issue = self._issue_cache[issue_number] = self.repo.get_issue(issue_number)
+        return issue
 
-### 🔍 Relevant Logs / Evidence
-```text
-{payload.relevant_logs or "No logs provided."}
+    def _get_file_text(self, path: str, ref: Optional[str] = None) -> str:
+        """
+        Downloads a file's text via the contents API's raw media type: no JSON envelope or
+        base64 decode, and files over 1 MB come back in full.
+        Raises GithubException (e.g. 404 for files missing at `ref`).
+        """
+        url = f"/repos/{self.repo_name}/contents/{quote(path)}"
+        status, response_headers, output = self.gh.requester.requestJson(
+            "GET", url, {"ref": ref} if ref else None, {"Accept": _RAW_MEDIA_TYPE}
+        )
+        if status >= 400:
+            raise GithubException(status, output, response_headers)
+        return output
+
+    def _graphql(self, query: str, **variables: Any) -> Dict[str, Any]:
+        """
+        Runs a GraphQL query with the client's credentials and returns its `data`.
+        Raises GithubException when the reply carries errors (e.g. RATE_LIMITED) instead of data.
+        """
+        headers, response = self.gh.requester.graphql_query(query, variables)
+        if response.get("errors") or not response.get("data"):
+            raise GithubException(200, response, headers)
+        return response["data"]
 
-```
+    def _query_issue_status(self, issue_number: int) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        Returns the issue state ("OPEN"/"CLOSED") and the first cross-referenced PR's
+        fields (number, state, url, head ref/sha, additions/deletions), or None.
+        PRs in other repositories that mention the issue are skipped.
+        Falls back to the REST timeline walk when the GraphQL query fails.
+        """
+        try:
+            return self._query_issue_status_graphql(issue_number)
+        except GithubException as e:
+            logger.warning(f"GraphQL status query failed for issue #{issue_number}, falling back to REST: {e}")
+            return self._query_issue_status_rest(issue_number)
+
+    def _query_issue_status_graphql(self, issue_number: int) -> Tuple[str, Optional[Dict[str, Any]]]:
+        owner, name = self.repo_name.split("/", 1)
+        after = None
+        while True:
+            issue = self._graphql(
+                _ISSUE_STATUS_QUERY, owner=owner, name=name, number=issue_number, after=after
+            )["repository"]["issue"]
+            timeline = issue["timelineItems"]
+
+            # Nodes whose source is an Issue (not a PR) come back with an empty source
+            pr = next(
+                (node["source"] for node in timeline["nodes"] if self._is_own_pr(node.get("source") or {})),
+                None
+            )
+            page_info = timeline.get("pageInfo") or {}
+            if pr or not page_info.get("hasNextPage"):
+                return issue["state"], pr
+            after = page_info["endCursor"]
+
+    def _is_own_pr(self, source: Dict[str, Any]) -> bool:
+        """True for a GraphQL PullRequest source that lives in this repository."""
+        if not source.get("number"):
+            return False
+        return source["repository"]["nameWithOwner"].lower() == self.repo_name.lower()
 
----
+    def _query_issue_status_rest(self, issue_number: int) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """Same result as the GraphQL query, via get_issue + the full timeline + get_pull."""
+        # Fresh lookup: the cached comment handle would keep reporting the state it was fetched with
+        issue = self.repo.get_issue(issue_number)
+        issue_state = issue.state.upper()
 
-*Generated by AI Agent Studio (Orchestrator)*
-"""
+        for event in issue.get_timeline():
+            # Pull Requests are Issues in the REST API; only those carry `pull_request`
+            if event.event == "cross-referenced" and event.source and event.source.issue:
+                source = event.source.issue
+                if source.pull_request and source.repository.full_name.lower() == self.repo_name.lower():
+                    pr = self.repo.get_pull(source.number)
+                    return issue_state, {
+                        "number": pr.number,
+                        "state": "MERGED" if pr.merged else pr.state.upper(),
+                        "url": pr.html_url,
+                        "headRefName": pr.head.ref,
+                        "headRefOid": pr.head.sha,
+                        "additions": pr.additions,
+                        "deletions": pr.deletions,
+                    }
+        return issue_state, None
+
+    def _build_raw_diff(self, pr_number: int) -> str:
+        """
+        Assembles the PR's unified diff, capped at MAX_RAW_DIFF_CHARS.
+        Once the cap is reached no further file pages are submitted (at most
+        _MAX_PAGE_WORKERS already in flight complete); the last file is cut at a line boundary.
+        """
+        diff_parts = []
+        size = 0
+        for f in self._iter_pr_files(pr_number):
+            if not f.get("patch"):
+                continue
 
-    def _format_file_list(self, files: Dict[str, str]) -> str:
-        if not files: return "_No specific files identified._"
-        return "\n".join([f"- `{path}`: {desc}" for path, desc in files.items()])
+            part = f"--- a/{f['filename']}\n+++ b/{f['filename']}\n{_fix_patch(f['patch'])}"
+            if size + len(part) > MAX_RAW_DIFF_CHARS:
+                head, newline, _ = part[:MAX_RAW_DIFF_CHARS - size].rpartition("\n")
+                diff_parts.append(head + newline)
+                logger.info(f"Diff of PR #{pr_number} truncated to {MAX_RAW_DIFF_CHARS} chars")
+                break
 
-    def _format_constraints(self, constraints: List[str]) -> str:
-        if not constraints: return "_No specific constraints._"
-        return "\n".join([f"- [ ] {c}" for c in constraints])
+            diff_parts.append(part)
+            size += len(part)
+
+        return "".join(diff_parts)
 
-    def _find_linked_pr(self, issue: Issue.Issue) -> Optional[PullRequest.PullRequest]:
+    def _iter_pr_files(self, pr_number: int) -> Iterator[Dict[str, Any]]:
+        """
+        Lists a PR's changed files (raw REST dicts) without first fetching the PR object.
+        Pages are fetched conditionally, so unchanged PRs cost only 304 replies; once the
+        first page reveals the page count, the remaining pages are fetched in parallel,
+        a bounded window at a time.
+        """
+        url = f"/repos/{self.repo_name}/pulls/{pr_number}/files"
+        first, headers = self._conditional_get(url, per_page=_FILES_PER_PAGE, page=1)
+        yield from first or []
+
+        # Lazily continued: a consumer that stops on the first page never fetches the rest
+        match = _LAST_PAGE_RE.search(headers.get("link", ""))
+        last_page = int(match.group(1)) if match else 1
+        if last_page <= 1:
+            return
+
+        def fetch_page(page: int) -> List[Dict[str, Any]]:
+            requester = self._worker_requester()
+            return self._conditional_get(url, requester=requester, per_page=_FILES_PER_PAGE, page=page)[0] or []
+
+        if self._page_pool is None:
+            self._page_pool = ThreadPoolExecutor(max_workers=_MAX_PAGE_WORKERS, thread_name_prefix="jules-pages")
+
+        # A sliding window of at most _MAX_PAGE_WORKERS requests in flight (Executor.map would
+        # submit every page up front). The next page is only submitted after the consumer
+        # resumes, so a consumer that stops early leaves later pages unrequested.
+        pages = iter(range(2, last_page + 1))
+        pending = deque(self._page_pool.submit(fetch_page, page) for page in islice(pages, _MAX_PAGE_WORKERS))
+        try:
+            while pending:
+                yield from pending.popleft().result()
+                page = next(pages, None)
+                if page is not None:
+                    pending.append(self._page_pool.submit(fetch_page, page))
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _worker_requester(self):
+        """Returns the calling page worker's own PyGithub requester (one pooled session per thread)."""
+        gh = getattr(self._worker_local, "gh", None)
+        if gh is None:
+            gh = self._worker_local.gh = Github(self._github_token.get_secret_value(), per_page=100, pool_size=1)
+        return gh.requester
+
+    def _conditional_get(self, url: str, requester=None, **parameters: Any) -> Tuple[Any, Dict[str, Any]]:
+        """
+        GET with If-None-Match: on 304 the previously parsed body (and headers) are returned.
+        Uses the client's requester unless another (e.g. a page worker's) is given.
+        Raises GithubException on error statuses, like PyGithub's own requests.
+        """
+        requester = requester or self.gh.requester
+        key = (url, tuple(sorted(parameters.items())))
+        with self._etag_lock:
+            cached = self._etag_cache.get(key)
+        headers = {"If-None-Match": cached[0]} if cached else None
+
+        status, response_headers, output = requester.requestJson("GET", url, parameters, headers)
+        if status == 304 and cached:
+            with self._etag_lock:
+                if key in self._etag_cache:
+                    self._etag_cache.move_to_end(key)
+            return cached[1], cached[2]
+
+        data = json.loads(output) if output else None
+        if status >= 400:
+            raise GithubException(status, data, response_headers)
+
+        etag = response_headers.get("etag")
+        if etag:
+            with self._etag_lock:
+                self._etag_cache[key] = (etag, data, response_headers)
+                self._etag_cache.move_to_end(key)
+                if len(self._etag_cache) > ETAG_CACHE_SIZE:
+                    self._etag_cache.popitem(last=False)
+        return data, response_headers
+
+    def _find_linked_pr(self, issue_number: int) -> Optional[PullRequest.PullRequest]:
         """
         Heuristic to find a PR linked to the issue.
-        Jules typically auto-links them.
+        Jules typically auto-links them, which shows up as a 'cross-referenced' timeline
+        event; GraphQL returns only those events instead of the whole paginated timeline.
+        Only PRs in this repository count (see _query_issue_status), so what gets
+        remembered per issue is always ours: once found, the link never changes.
         """
-        # Strategy 1: Check Timeline for 'Cross-referenced' events
-        timeline = issue.get_timeline()
-        for event in timeline:
-            if event.event == "cross-referenced" and event.source and event.source.issue:
-                # If the source is a PR (Pull Requests are Issues in GitHub API)
-                if event.source.issue.pull_request:
-                    return event.source.issue.as_pull_request()
-        return None
+        pr = self._linked_pr_cache.get(issue_number)
+        if pr is not None:
+            return pr
+
+        _, linked = self._query_issue_status(issue_number)
+        if not linked:
+            return None
+
+        pr = self._linked_pr_cache[issue_number] = self.repo.get_pull(linked["number"])
+        return pr
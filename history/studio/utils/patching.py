@@ -7,55 +7,305 @@ Used by the QA Agent to prepare the sandbox environment.
 
 import os
 import io
+import re
+import shutil
 import tempfile
+import threading
 import subprocess
 import logging
-from typing import Dict, List, Optional
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 from unidiff import PatchSet
+from unidiff.constants import LINE_TYPE_ADDED, LINE_TYPE_CONTEXT, LINE_TYPE_NO_NEWLINE, LINE_TYPE_REMOVED
 
 logger = logging.getLogger("studio.utils.patching")
 
+# ---/+++ header of a (possibly malformed) diff: the marker, an optional git a/ or b/
+# prefix (only when a path follows it) and the path up to any tab-separated timestamp.
+_HEADER_RE = re.compile(r"^(?P<marker>---|\+\+\+) [^\S\t]*(?P<prefix>[ab]/(?=[^\t]*\S))?(?P<path>[^\t]*)")
+
+# Lines the manual normalization keeps verbatim. Hunk body lines are by far the most
+# common and are classified by their first character alone; hunk headers and git
+# extended headers need a full prefix comparison.
+_FAST_PREFIXES = frozenset('+- \\')
+_GIT_HEADERS = ("diff --git ", "index ", "new file mode ", "deleted file mode ",
+                "old mode ", "new mode ", "similarity index ", "rename from ",
+                "rename to ", "copy from ", "copy to ")
+_KEPT_PREFIXES = ("@@",) + _GIT_HEADERS
+
+# Paths that never name a real file in the workset
+_NOT_A_FILE = frozenset(("/dev/null", ""))
+
+def _parse_patch(diff_content: str, metadata_only: bool = False) -> Optional[PatchSet]:
+    """
+    Parses a diff with unidiff, or returns None if it is malformed (e.g. LLM output).
+    metadata_only skips storing hunk line contents; use it when only paths are needed.
+    """
+    try:
+        try:
+            return PatchSet(io.StringIO(diff_content), metadata_only=metadata_only)
+        except TypeError:
+            # unidiff < 0.7 has no metadata_only switch
+            return PatchSet(io.StringIO(diff_content))
+    except Exception as e:
+        logger.warning(f"unidiff failed to parse diff, using manual fallback: {e}")
+        return None
+
+def _files_in_patch_set(patch_set: PatchSet) -> List[str]:
+    """Unique paths of a parsed diff; .path already handles a/ and b/ prefixes."""
+    return sorted({patched_file.path for patched_file in patch_set} - _NOT_A_FILE)
+
+def _files_in_headers(diff_content: str) -> List[str]:
+    """Manual fallback: unique paths from the ---/+++ header lines of an unparseable diff."""
+    # Unified diff headers: --- a/path/to/file or +++ b/path/to/file. Iterating a StringIO
+    # yields one line at a time instead of materializing a list.
+    affected_files = {
+        match.group("path").strip()
+        for match in map(_HEADER_RE.match, io.StringIO(diff_content))
+        if match
+    }
+    return sorted(affected_files - _NOT_A_FILE)
+
 def extract_affected_files(diff_content: str) -> List[str]:
     """
     Extracts all unique file paths mentioned in a unified diff.
     Supports both standard and git-style diffs.
     """
-    affected_files = set()
-    try:
-        # unidiff is robust for standard unified diffs
-        patch_set = PatchSet(io.StringIO(diff_content))
-        for patched_file in patch_set:
-            # .path automatically handles a/ and b/ prefixes
-            path = patched_file.path
-            if path and path != "/dev/null":
-                affected_files.add(path)
-    except Exception as e:
-        logger.warning(f"unidiff failed to extract affected files, falling back to manual regex: {e}")
-        for line in diff_content.splitlines():
-            # Unified diff headers: --- a/path/to/file or +++ b/path/to/file
-            if line.startswith("--- ") or line.startswith("+++ "):
-                # Extract path, removing '--- ' or '+++ '
-                path = line[4:].split('\t')[0].strip()
+    # unidiff is robust for standard unified diffs; only paths are needed, so hunk
+    # bodies are validated but not stored
+    patch_set = _parse_patch(diff_content, metadata_only=True)
+    if patch_set is None:
+        return _files_in_headers(diff_content)
+    return _files_in_patch_set(patch_set)
+
+def _is_git_rename(patched_file) -> bool:
+    """unidiff's is_rename also fires for plain "--- x.orig / +++ x" diffs; only git headers mean a real rename."""
+    return patched_file.is_rename and any(line.startswith("rename from ") for line in patched_file.patch_info or ())
+
+def _needs_patch_command(patched_file) -> bool:
+    """Git renames and binary diffs rely on patch(1)'s git-format support instead of the in-memory applier."""
+    return patched_file.is_binary_file or _is_git_rename(patched_file)
+
+def _renamed_sources(patch_set: PatchSet) -> List[str]:
+    """Old paths of git renames; patch(1) removes them once the rename is applied."""
+    sources = []
+    for patched_file in patch_set:
+        if _is_git_rename(patched_file):
+            source = patched_file.source_file
+            sources.append(source[2:] if source.startswith("a/") else source)
+    return sources
+
+class PatchApplyError(Exception):
+    """Raised when a hunk's context cannot be found in the in-memory file."""
+
+def _hunk_sides(hunk) -> Tuple[List[str], List[Union[str, int]]]:
+    """
+    Splits a hunk into the lines it expects (context + removed) and the lines it
+    produces, honouring '\\ No newline at end of file' markers. Produced context lines
+    are given as indexes into the expected lines, so they are copied from the file
+    rather than from the diff; added lines are given as text.
+    """
+    source: List[str] = []
+    target: List[Union[str, int]] = []
+    previous = None
+    for line in hunk:
+        if line.line_type == LINE_TYPE_NO_NEWLINE:
+            # The marker applies to the line right before it
+            if previous in (LINE_TYPE_CONTEXT, LINE_TYPE_REMOVED) and source:
+                source[-1] = source[-1].rstrip("\r\n")
+            if previous == LINE_TYPE_ADDED and target:
+                target[-1] = target[-1].rstrip("\r\n")
+            continue
+        if line.line_type == LINE_TYPE_CONTEXT:
+            target.append(len(source))
+        elif line.line_type == LINE_TYPE_ADDED:
+            target.append(line.value)
+        if line.line_type in (LINE_TYPE_CONTEXT, LINE_TYPE_REMOVED):
+            source.append(line.value)
+        previous = line.line_type
+    return source, target
+
+def _context_edges(hunk) -> Tuple[int, int]:
+    """Counts the hunk's leading and trailing context lines."""
+    types = [line.line_type for line in hunk if line.line_type != LINE_TYPE_NO_NEWLINE]
+    prefix = next((i for i, t in enumerate(types) if t != LINE_TYPE_CONTEXT), len(types))
+    suffix = next((i for i, t in enumerate(reversed(types)) if t != LINE_TYPE_CONTEXT), len(types))
+    return prefix, suffix
+
+def _locate(lines: List[str], expected: List[str], start: int, floor: int, frozen: int,
+            prefix: int, suffix: int, first: int) -> Optional[int]:
+    """
+    Finds where `expected` occurs in `lines` the way patch(1) does without fuzz: the stated
+    position first, then outwards, forward offset first. A hunk with less leading than
+    trailing context that claims line `first` <= 1 only matches at the start of the file;
+    one with less trailing than leading context only matches at the end.
+    Lines must match exactly, line endings included; anything looser goes to patch(1).
+    Matches never start before `floor`, the end of the previous hunk. patch(1) only
+    protects lines up to `frozen`, the previous hunk's last change, so where it could
+    match in between (or further back), None is returned and the overlap is left to it.
+    """
+    size = len(expected)
+    last = len(lines) - size
+    if last < floor:
+        return None
+
+    def matches(at: int) -> bool:
+        return lines[at:at + size] == expected
+
+    if prefix < suffix and first <= 1:
+        return 0 if floor == 0 and matches(0) else None
+    if suffix < prefix:
+        return last if matches(last) else None
+    # patch(1) searches forward from a stated position behind the floor, and back to
+    # `frozen` less the context imbalance
+    reach = max(0, min(start, frozen - max(0, suffix - prefix)))
+    if any(matches(at) for at in range(reach, floor)):
+        return None
+
+    start = min(max(start, floor), last)
+    for delta in range(max(start - floor, last - start) + 1):
+        for at in (start + delta, start - delta):
+            if floor <= at <= last and matches(at):
+                return at
+    return None
+
+def _apply_patched_file(original: str, patched_file) -> str:
+    """Applies one file's hunks to its content in memory."""
+    # Split on "\n" only, like patch(1); splitlines() would also break on \r, \f, \v, ...
+    lines = io.StringIO(original).readlines()
+    result: List[str] = []
+    consumed = 0
+    frozen = 0
+    offset = 0
+
+    for hunk in patched_file:
+        source, target = _hunk_sides(hunk)
+        # "-N,0" inserts after line N; otherwise hunks start at line N (1-based)
+        stated = hunk.source_start if hunk.source_length == 0 else hunk.source_start - 1
+        prefix, suffix = _context_edges(hunk)
+        at = _locate(lines, source, stated + offset, consumed, frozen, prefix, suffix, hunk.source_start)
+        if at is None:
+            raise PatchApplyError(f"hunk at line {hunk.source_start} does not match {patched_file.path}")
+
+        result.extend(lines[consumed:at])
+        # Text that ended without a newline gains one when lines are added after it
+        if target and result and not result[-1].endswith("\n"):
+            result[-1] += "\n"
+        result.extend(lines[at + item] if isinstance(item, int) else item for item in target)
+        consumed = at + len(source)
+        frozen = consumed - suffix
+        offset = at - stated
 
-                # Skip special markers
-                if path in ["/dev/null", ""]:
-                    continue
+    result.extend(lines[consumed:])
+    return "".join(result)
 
-                # Strip git-style prefixes (a/ or b/)
-                if (path.startswith("a/") or path.startswith("b/")) and len(path) > 2:
-                    path = path[2:]
+def _apply_patch_set(workset: Dict[str, str], patch_set: PatchSet) -> Dict[str, str]:
+    """
+    Applies a parsed diff to the workset without touching disk.
+    Raises PatchApplyError when a hunk does not apply cleanly, or when a file creation or
+    deletion does not fit the current content (the caller falls back to patch(1)).
+    """
+    result = workset.copy()
+    for patched_file in patch_set:
+        path = patched_file.path
+        original = result.get(path, "")
+        if patched_file.source_file == "/dev/null" and original:
+            raise PatchApplyError(f"{path} is created by the diff but already has content")
+        patched = _apply_patched_file(original, patched_file)
+        # Only an explicit /dev/null target deletes; a diff that merely empties a file keeps it
+        if patched_file.target_file == "/dev/null":
+            if patched:
+                raise PatchApplyError(f"{path} is deleted by the diff but is not empty after its hunks")
+            result.pop(path, None)
+        else:
+            result[path] = patched
+    return result
+
+class _Sandbox:
+    """A patch(1) working tree plus a record of the file contents currently written to it."""
+
+    def __init__(self, base: str):
+        self.base = base
+        self.tree = os.path.join(base, "tree")
+        self.patch_path = os.path.join(base, "changes.patch")
+        self.on_disk: Dict[str, str] = {}
+        # Set when patch(1) may have left files the record does not know about
+        self.dirty = False
+
+    def sync(self, workset: Dict[str, str]):
+        """Makes the tree hold exactly `workset`, rewriting only files whose content changed."""
+        if self.dirty:
+            shutil.rmtree(self.tree, ignore_errors=True)
+            self.on_disk, self.dirty = {}, False
+
+        for path in self.on_disk.keys() - workset.keys():
+            try:
+                os.remove(os.path.join(self.tree, path))
+            except FileNotFoundError:
+                pass
+
+        changed = {path: content for path, content in workset.items() if self.on_disk.get(path) != content}
+        full_paths = {path: os.path.join(self.tree, path) for path in changed}
+        # Create each distinct parent directory once
+        for directory in {os.path.dirname(full_path) for full_path in full_paths.values()} | {self.tree}:
+            os.makedirs(directory, exist_ok=True)
+        for path, content in changed.items():
+            with open(full_paths[path], "w", encoding="utf-8") as f:
+                f.write(content)
+        self.on_disk = dict(workset)
 
-                affected_files.add(path)
+    def remove(self):
+        shutil.rmtree(self.base, ignore_errors=True)
 
-    return sorted(list(affected_files))
+class SandboxPool:
+    """
+    Reusable patch(1) working directories for callers that apply many patches in a row
+    (e.g. successive QA refinements of one fix). A reused sandbox only rewrites the files
+    that changed since its last run instead of the whole workset.
+    """
+
+    def __init__(self, max_idle: int = 2):
+        self._max_idle = max_idle
+        self._idle: List[_Sandbox] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self) -> Iterator[_Sandbox]:
+        with self._lock:
+            sandbox = self._idle.pop() if self._idle else None
+        if sandbox is None:
+            sandbox = _Sandbox(tempfile.mkdtemp(prefix="studio-patch-"))
+        try:
+            yield sandbox
+        except BaseException:
+            # Unknown state (e.g. a failed patch left .rej files): start clean next time
+            sandbox.dirty = True
+            raise
+        finally:
+            with self._lock:
+                if len(self._idle) < self._max_idle:
+                    self._idle.append(sandbox)
+                    sandbox = None
+            if sandbox is not None:
+                sandbox.remove()
+
+    def close(self):
+        """Removes all idle sandboxes from disk."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for sandbox in idle:
+            sandbox.remove()
 
-def apply_virtual_patch(files: Dict[str, str], diff_content: str) -> Dict[str, str]:
+def apply_virtual_patch(files: Dict[str, str], diff_content: str,
+                        sandbox_pool: Optional["SandboxPool"] = None) -> Dict[str, str]:
     """
     Applies a unified diff to a set of files in memory.
 
     Args:
         files: A dictionary of {filepath: content}.
         diff_content: The unified diff string.
+        sandbox_pool: Optional SandboxPool for callers that apply many patches in a row;
+            by default patch(1) runs in a fresh temporary directory.
 
     Returns:
         A dictionary of {filepath: patched_content}.
@@ -63,19 +313,44 @@ def apply_virtual_patch(files: Dict[str, str], diff_content: str) -> Dict[str, s
     if not diff_content.strip():
         return files.copy()
 
+    # The diff is parsed once; every step below reuses the PatchSet.
+    patch_set = _parse_patch(diff_content)
+    if patch_set is not None and not patch_set:
+        # Parsed cleanly but names no files (e.g. only prose): patch(1) would reject it as
+        # garbage, so fail the same way without starting it
+        raise RuntimeError("Failed to apply patch: no file changes found in the diff")
+    needs_patch_command = patch_set is not None and any(_needs_patch_command(pf) for pf in patch_set)
+
     # 1. Initialize any files mentioned in the diff that aren't in our dictionary
     # This allows the 'patch' command to create new files correctly.
-    affected_files = extract_affected_files(diff_content)
+    affected_files = _files_in_headers(diff_content) if patch_set is None else _files_in_patch_set(patch_set)
     patched_files_workset = files.copy()
     for path in affected_files:
         if path not in patched_files_workset:
             logger.info(f"Initializing new file for patching: {path}")
             patched_files_workset[path] = ""
 
+    # Fast path: a well-formed diff is applied in memory, with no tempdir or patch(1) process.
+    # Hunks that need fuzz, git renames, binary diffs and anything unidiff could not parse
+    # go through patch(1) below.
+    if patch_set is not None and not needs_patch_command:
+        try:
+            result = _apply_patch_set(patched_files_workset, patch_set)
+            logger.info("Patch applied in memory.")
+            return result
+        except PatchApplyError as e:
+            logger.info(f"In-memory apply failed, falling back to patch(1): {e}")
+
     # 2. Normalize the diff
-    try:
-        # Try using unidiff for clean normalization
-        patch_set = PatchSet(io.StringIO(diff_content))
+    if needs_patch_command:
+        # Keep the git headers patch(1) needs for renames; paths keep their a/ and b/
+        # prefixes, so -p1 is tried first and the renamed-away sources are read back too.
+        affected_files = affected_files + _renamed_sources(patch_set)
+        logger.info("Diff contains git renames or binary files; applying it unmodified.")
+    elif patch_set is not None:
+        # Use unidiff for clean normalization. Hunks are rendered the way str(patched_file)
+        # renders them; the header is written by hand so git extended headers and
+        # timestamps are dropped and the a/ and b/ prefixes stripped.
         new_diff_parts = []
         for patched_file in patch_set:
             source = patched_file.source_file
@@ -84,102 +359,102 @@ def apply_virtual_patch(files: Dict[str, str], diff_content: str) -> Dict[str, s
             if source.startswith("a/") and source != "a/": source = source[2:]
             if target.startswith("b/") and target != "b/": target = target[2:]
 
-            new_diff_parts.append(f"--- {source}\n")
-            new_diff_parts.append(f"+++ {target}\n")
-            for hunk in patched_file:
-                hunk_str = str(hunk)
-                if not hunk_str.endswith("\n"):
-                    hunk_str += "\n"
-                new_diff_parts.append(hunk_str)
+            hunks = "".join(map(str, patched_file))
+            new_diff_parts.append(f"--- {source}\n+++ {target}\n{hunks}")
+            # Only the diff's very last line can lack its newline
+            if hunks and not hunks.endswith("\n"):
+                new_diff_parts.append("\n")
         diff_content = "".join(new_diff_parts)
         logger.info("Normalized diff using unidiff.")
-    except Exception as e:
-        logger.warning(f"unidiff failed to normalize diff, using manual fallback: {e}")
-        # Manual fallback to fix common LLM issues
-        fixed_lines = []
-        git_headers = ("diff --git ", "index ", "new file mode ", "deleted file mode ",
-                       "old mode ", "new mode ", "similarity index ", "rename from ",
-                       "rename to ", "copy from ", "copy to ")
-
-        for line in diff_content.splitlines():
-            if line.startswith("--- "):
-                # Strip a/ prefix for -p0 compatibility
-                path_part = line[4:].split('\t')[0].strip()
-                if (path_part.startswith("a/") or path_part.startswith("b/")) and len(path_part) > 2:
-                    line = "--- " + path_part[2:]
-                fixed_lines.append(line)
-            elif line.startswith("+++ "):
-                # Strip b/ prefix for -p0 compatibility
-                path_part = line[4:].split('\t')[0].strip()
-                if (path_part.startswith("a/") or path_part.startswith("b/")) and len(path_part) > 2:
-                    line = "+++ " + path_part[2:]
-                fixed_lines.append(line)
-            elif line.startswith(('+', '-', '@@', '\\', ' ')) or line.startswith(git_headers):
-                fixed_lines.append(line)
+    else:
+        # Manual fallback to fix common LLM issues, written straight into one buffer
+        fixed = io.StringIO()
+
+        for line in io.StringIO(diff_content):
+            line = line.rstrip("\r\n")
+            first = line[:1]
+            if first in _FAST_PREFIXES:
+                header = _HEADER_RE.match(line) if first in "+-" else None
+                if header and header.group("prefix"):
+                    # Strip a/ and b/ prefixes for -p0 compatibility
+                    line = f"{header.group('marker')} {header.group('path').strip()}"
             elif not line:
-                fixed_lines.append(' ')
-            else:
+                line = ' '
+            elif not line.startswith(_KEPT_PREFIXES):
                 # Likely a context line that lost its leading space
-                fixed_lines.append(' ' + line)
-        diff_content = "\n".join(fixed_lines) + "\n"
-
-    with tempfile.TemporaryDirectory() as tmpdir:
-        # 3. Write original (and initialized empty) files to temp dir
-        for filepath, content in patched_files_workset.items():
-            full_path = os.path.join(tmpdir, filepath)
-            os.makedirs(os.path.dirname(full_path), exist_ok=True)
-            with open(full_path, "w", encoding="utf-8") as f:
-                f.write(content)
+                fixed.write(' ')
+            fixed.write(line)
+            fixed.write("\n")
+        diff_content = fixed.getvalue()
 
-        # 4. Write diff to a file
-        patch_path = os.path.join(tmpdir, "changes.patch")
-        with open(patch_path, "w", encoding="utf-8") as f:
-            f.write(diff_content)
+    if sandbox_pool is None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            return _run_patch_command(_Sandbox(tmpdir), files, patched_files_workset, diff_content,
+                                      affected_files, needs_patch_command)
+    with sandbox_pool.acquire() as sandbox:
+        return _run_patch_command(sandbox, files, patched_files_workset, diff_content,
+                                  affected_files, needs_patch_command)
 
-        # 5. Apply patch
-        # Since we stripped a/ and b/ prefixes, we use -p0 primarily.
-        cmd = ["patch", "-p0", "--input", "changes.patch"]
+def _run_patch_command(sandbox: "_Sandbox", files: Dict[str, str], workset: Dict[str, str], diff_content: str,
+                       affected_files: List[str], git_format: bool) -> Dict[str, str]:
+    """Applies a diff with patch(1) inside `sandbox` and returns the patched files."""
+    # 3. Write original (and initialized empty) files to the sandbox
+    sandbox.sync(workset)
 
-        try:
+    # 4. Write diff to a file (next to the tree, so it never collides with a workset path)
+    with open(sandbox.patch_path, "w", encoding="utf-8") as f:
+        f.write(diff_content)
+
+    # 5. Apply patch
+    # Since we stripped a/ and b/ prefixes, we use -p0 primarily.
+    strip, fallback_strip = ("-p1", "-p0") if git_format else ("-p0", "-p1")
+    cmd = ["patch", strip, "--input", sandbox.patch_path]
+
+    try:
+        result = subprocess.run(
+            cmd,
+            cwd=sandbox.tree,
+            capture_output=True,
+            text=True,
+            check=False # We handle errors manually
+        )
+
+        if result.returncode != 0:
+            logger.warning(f"Patch failed with {strip}: {result.stderr or result.stdout}")
+            # The failed attempt may have left partial edits and .rej files behind
+            sandbox.dirty = True
+            # Fallback to the other strip level just in case
+            cmd[1] = fallback_strip
+            if fallback_strip == "-p1":
+                # -p1 drops the first path component, so that is where patch(1) writes
+                affected_files = affected_files + [path.split("/", 1)[1] for path in affected_files if "/" in path]
             result = subprocess.run(
                 cmd,
-                cwd=tmpdir,
+                cwd=sandbox.tree,
                 capture_output=True,
                 text=True,
-                check=False # We handle errors manually
+                check=False
             )
-
             if result.returncode != 0:
-                logger.warning(f"Patch failed with -p0: {result.stderr or result.stdout}")
-                # Fallback to -p1 just in case
-                cmd[1] = "-p1"
-                result = subprocess.run(
-                    cmd,
-                    cwd=tmpdir,
-                    capture_output=True,
-                    text=True,
-                    check=False
-                )
-                if result.returncode != 0:
-                     logger.error(f"Patch failed with -p1 as well: {result.stderr or result.stdout}")
-                     raise RuntimeError(f"Failed to apply patch: {result.stderr or result.stdout}")
-
-            logger.info("Patch applied successfully.")
-
-        except FileNotFoundError:
-             raise RuntimeError("patch command not found. Please install patch.")
-
-        # 6. Read back all files
-        patched_files_result = {}
-        for root, _, filenames in os.walk(tmpdir):
-            for filename in filenames:
-                if filename == "changes.patch":
-                    continue
-
-                abs_path = os.path.join(root, filename)
-                rel_path = os.path.relpath(abs_path, tmpdir)
-
-                with open(abs_path, "r", encoding="utf-8") as f:
-                    patched_files_result[rel_path] = f.read()
-
-        return patched_files_result
+                 logger.error(f"Patch failed with {fallback_strip} as well: {result.stderr or result.stdout}")
+                 raise RuntimeError(f"Failed to apply patch: {result.stderr or result.stdout}")
+
+        logger.info("Patch applied successfully.")
+
+    except FileNotFoundError:
+         raise RuntimeError("patch command not found. Please install patch.")
+
+    # 6. Read back only the files the diff touched; everything else is unchanged.
+    # Reading by path also skips patch(1) side files such as *.orig backups.
+    patched_files_result = files.copy()
+    for path in affected_files:
+        abs_path = os.path.join(sandbox.tree, path)
+        if not os.path.isfile(abs_path):
+            # Deleted by the patch
+            patched_files_result.pop(path, None)
+            sandbox.on_disk.pop(path, None)
+            continue
+        with open(abs_path, "r", encoding="utf-8") as f:
+            patched_files_result[path] = sandbox.on_disk[path] = f.read()
+
+    return patched_files_result
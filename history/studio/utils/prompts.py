@@ -1,6 +1,14 @@
 import json
 import logging
 import os
+from typing import Dict, Optional, Tuple
+
+try:
+    # orjson parses bytes directly and is several times faster on large prompt strings;
+    # its JSONDecodeError subclasses json.JSONDecodeError, so error handling is unchanged.
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
 
 logger = logging.getLogger("studio.utils.prompts")
 
@@ -30,20 +38,41 @@ from studio.utils.acl import verify_write_permission
 
 PROMPTS_JSON = "product/prompts/prompts.json"
 
+# Parsed prompts.json, keyed by (absolute path, mtime, size) so edits on disk are
+# picked up without re-reading the file on every agent invocation.
+_prompts_cache: Dict[str, str] = {}
+_prompts_stamp: Optional[Tuple[str, int, int]] = None
+
+def _load_prompts() -> Dict[str, str]:
+    """Returns the learned prompts from PROMPTS_JSON, re-reading it only when the file changed."""
+    global _prompts_cache, _prompts_stamp
+
+    path = os.path.abspath(PROMPTS_JSON)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return {}
+
+    stamp = (path, st.st_mtime_ns, st.st_size)
+    if stamp == _prompts_stamp:
+        return _prompts_cache
+
+    try:
+        with open(path, "rb") as f:
+            prompts = _json_loads(f.read())
+    except (json.JSONDecodeError, IOError) as e:
+        logger.error(f"Failed to load prompts from {PROMPTS_JSON}: {e}. Falling back to defaults.")
+        prompts = {}
+
+    _prompts_cache, _prompts_stamp = prompts, stamp
+    return prompts
+
 def fetch_system_prompt(role: str) -> str:
     """
     Fetches the system prompt for a given role.
     Learned (product/prompts/prompts.json) > Default (DEFAULT_PROMPTS).
     """
-    prompts = {}
-    if os.path.exists(PROMPTS_JSON):
-        try:
-            with open(PROMPTS_JSON, "r") as f:
-                prompts = json.load(f)
-        except (json.JSONDecodeError, IOError) as e:
-            logger.error(f"Failed to load prompts from {PROMPTS_JSON}: {e}. Falling back to defaults.")
-            prompts = {}
-
+    prompts = _load_prompts()
     return prompts.get(role, DEFAULT_PROMPTS.get(role, "You are a helpful AI assistant."))
 
 def update_system_prompt(role: str, new_prompt: str):
@@ -57,16 +86,19 @@ def update_system_prompt(role: str, new_prompt: str):
     prompts = {}
     if os.path.exists(PROMPTS_JSON):
         try:
-            with open(PROMPTS_JSON, "r") as f:
-                prompts = json.load(f)
+            with open(PROMPTS_JSON, "rb") as f:
+                prompts = _json_loads(f.read())
         except (json.JSONDecodeError, IOError):
             prompts = {}
 
     prompts[role] = new_prompt
 
+    global _prompts_stamp
     try:
         with open(PROMPTS_JSON, "w") as f:
             json.dump(prompts, f, indent=4)
+        # Force the next fetch to re-read, even if mtime and size happen to match
+        _prompts_stamp = None
         logger.info(f"Updated system prompt for {role} and saved to {PROMPTS_JSON}.")
     except IOError as e:
         logger.error(f"Failed to save prompts to {PROMPTS_JSON}: {e}")
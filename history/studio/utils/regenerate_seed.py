@@ -1,5 +1,7 @@
+import os
 from studio.memory import StudioState, OrchestrationState, EngineeringState, VerificationGate
-import json
+
+SEED_PATHS = ("studio_state.seed.json", "studio/studio_state.seed.json")
 
 def generate_seed():
     state = StudioState(
@@ -13,21 +15,24 @@ def generate_seed():
         )
     )
 
-    seed_content = state.model_dump()
-
-    # We need to handle datetime if any were in the defaults,
-    # but looking at the schema, there are none in the top level states
-    # except in nested lists which are empty by default.
-    # Actually, Pydantic's model_dump with mode='json' is better if we had datetimes.
-    # Since we use pydantic v2, let's use model_dump(mode='json')
-
-    seed_json = state.model_dump(mode='json')
+    # Serialize once with Pydantic v2's native JSON encoder (handles datetimes too) and
+    # write the same bytes to every seed location.
+    payload = state.model_dump_json(indent=2).encode("utf-8")
 
-    with open("studio_state.seed.json", "w") as f:
-        json.dump(seed_json, f, indent=2)
+    for path in SEED_PATHS:
+        # Leave unchanged seeds untouched (no rewrite, no mtime bump for file watchers)
+        try:
+            with open(path, "rb") as f:
+                if f.read() == payload:
+                    continue
+        except OSError:
+            pass
 
-    with open("studio/studio_state.seed.json", "w") as f:
-        json.dump(seed_json, f, indent=2)
+        # Write to a sibling file and swap it in, so readers never see a partial seed
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
 
 if __name__ == "__main__":
     generate_seed()
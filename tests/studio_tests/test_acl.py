@@ -0,0 +1,31 @@
+import pytest
+from studio.utils.acl import verify_write_permission, is_path_allowed
+
+
+def test_allows_paths_inside_prompts_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert is_path_allowed("product/prompts/prompts.json")
+    verify_write_permission("product/prompts/engineer.md")
+
+
+def test_denies_paths_outside_prompts_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert not is_path_allowed("studio/orchestrator.py")
+    assert not is_path_allowed("product/prompts/../../AGENTS.md")
+    with pytest.raises(PermissionError):
+        verify_write_permission("AGENTS.md")
+
+
+def test_base_follows_working_directory(tmp_path, monkeypatch):
+    first = tmp_path / "a"
+    second = tmp_path / "b"
+    first.mkdir()
+    second.mkdir()
+
+    monkeypatch.chdir(first)
+    assert is_path_allowed("product/prompts/prompts.json")
+    assert not is_path_allowed(str(second / "product/prompts/prompts.json"))
+
+    monkeypatch.chdir(second)
+    assert is_path_allowed("product/prompts/prompts.json")
+    assert not is_path_allowed(str(first / "product/prompts/prompts.json"))
@@ -0,0 +1,236 @@
+import asyncio
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+from langchain_core.messages import HumanMessage
+
+from studio.memory import JulesMetadata, CodeChangeArtifact
+from studio.subgraphs import engineer
+from studio.subgraphs.engineer import node_task_dispatcher, _bulk_create_placeholders, _get_calculator
+
+
+@pytest.fixture(autouse=True)
+def fresh_jules_client():
+    engineer.get_jules_client.cache_clear()
+    yield
+    engineer.get_jules_client.cache_clear()
+
+
+def test_bulk_create_placeholders_creates_missing_files(tmp_path):
+    existing = tmp_path / "existing.py"
+    existing.write_text("print('keep me')\n")
+    new_a = tmp_path / "pkg" / "a.py"
+    new_b = tmp_path / "pkg" / "b.py"
+
+    failed = _bulk_create_placeholders({str(existing), str(new_a), str(new_b)})
+
+    assert failed == set()
+    assert existing.read_text() == "print('keep me')\n"
+    assert new_a.exists() and new_a.read_text() == ""
+    assert new_b.exists() and new_b.read_text() == ""
+
+
+def test_bulk_create_placeholders_reports_failures(tmp_path):
+    blocker = tmp_path / "blocker"
+    blocker.write_text("not a directory")
+    bad = os.path.join(str(blocker), "child.py")
+
+    failed = _bulk_create_placeholders({bad})
+
+    assert failed == {bad}
+
+
+@pytest.mark.asyncio
+@patch("studio.subgraphs.engineer.JulesGitHubClient")
+async def test_dispatcher_creates_placeholders_and_dispatches(mock_client_cls, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    mock_client = MagicMock()
+    mock_client.dispatch_task.return_value = "42"
+    mock_client_cls.return_value = mock_client
+
+    state = {
+        "messages": [HumanMessage(content="Implement src/new_module.py and tests/test_new_module.py")],
+        "system_constitution": "",
+        "next_agent": None,
+        "jules_metadata": JulesMetadata(session_id="s1").model_dump(mode="json"),
+    }
+
+    result = await node_task_dispatcher(state)
+
+    meta = JulesMetadata(**result["jules_metadata"])
+    assert meta.status == "WORKING"
+    assert meta.external_task_id == "42"
+    assert meta.active_context_slice.files == ["src/new_module.py", "tests/test_new_module.py"]
+    assert (tmp_path / "src" / "new_module.py").exists()
+    assert (tmp_path / "tests" / "test_new_module.py").exists()
+    mock_client.dispatch_task.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch("studio.subgraphs.engineer.JulesGitHubClient")
+async def test_dispatcher_skips_redispatch_of_identical_payload(mock_client_cls, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "README.md").write_text("anchor\n")
+    mock_client = MagicMock()
+    mock_client.dispatch_task.return_value = "7"
+    mock_client_cls.return_value = mock_client
+
+    meta = JulesMetadata(session_id="s1", retry_count=1, feedback_log=["Tests failed."])
+    state = {
+        "messages": [HumanMessage(content="Fix the parser")],
+        "system_constitution": "",
+        "next_agent": None,
+        "jules_metadata": meta.model_dump(mode="json"),
+    }
+
+    first = await node_task_dispatcher(state)
+    second = await node_task_dispatcher({**state, "jules_metadata": first["jules_metadata"]})
+
+    assert mock_client.dispatch_task.call_count == 1
+    meta_after = JulesMetadata(**second["jules_metadata"])
+    assert meta_after.external_task_id == "7"
+    assert meta_after.status == "WORKING"
+
+    # New feedback changes the work order, so it must be dispatched again.
+    changed = dict(second["jules_metadata"], feedback_log=["Tests failed.", "Still failing."])
+    await node_task_dispatcher({**state, "jules_metadata": changed})
+    assert mock_client.dispatch_task.call_count == 2
+
+
+@pytest.mark.asyncio
+@patch("studio.subgraphs.engineer.GenerativeModel")
+async def test_entropy_calculator_is_built_once_per_model(mock_gen_model, monkeypatch):
+    monkeypatch.setattr(engineer, "_CALCULATORS", {})
+
+    first = await _get_calculator("judge-model")
+    second = await _get_calculator("judge-model")
+    other = await _get_calculator("other-model")
+
+    assert first is second
+    assert other is not first
+    assert mock_gen_model.call_count == 2
+
+@patch("studio.subgraphs.engineer.GenerativeModel")
+def test_entropy_calculator_is_shared_across_event_loops(mock_gen_model, monkeypatch):
+    monkeypatch.setattr(engineer, "_CALCULATORS", {})
+
+    async def fetch_concurrently():
+        return await asyncio.gather(*(_get_calculator("judge-model") for _ in range(3)))
+
+    # Separate asyncio.run calls, as when the graph is invoked more than once per process
+    first = asyncio.run(fetch_concurrently())
+    second = asyncio.run(fetch_concurrently())
+
+    assert len({id(c) for c in first + second}) == 1
+    assert mock_gen_model.call_count == 1
+
+
+@pytest.mark.asyncio
+@patch("studio.subgraphs.engineer.extract_affected_files")
+@patch("studio.subgraphs.engineer.ArchitectAgent")
+async def test_architect_gate_uses_precomputed_affected_files(mock_architect_cls, mock_extract, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "calc.py").write_text("def add(a, b):\n    return a + b\n")
+    mock_architect = MagicMock()
+    mock_architect.review_code.return_value = MagicMock(status="APPROVED", violations=[])
+    mock_architect_cls.return_value = mock_architect
+
+    meta = JulesMetadata(
+        status="COMPLETED",
+        generated_artifacts=[CodeChangeArtifact(diff_content="--- a/calc.py\n+++ b/calc.py\n", affected_files=["calc.py"])],
+    )
+    state = {"messages": [], "system_constitution": "", "next_agent": None, "jules_metadata": meta.model_dump(mode="json")}
+
+    await engineer.node_architect_gate(state)
+
+    mock_extract.assert_not_called()
+    reviewed = [c.args[0] for c in mock_architect.review_code.call_args_list]
+    assert reviewed == ["calc.py"]
+
+
+def test_engineer_subgraph_is_compiled_once():
+    engineer.build_engineer_subgraph.cache_clear()
+
+    first = engineer.build_engineer_subgraph()
+    second = engineer.build_engineer_subgraph()
+    assert first is second
+
+    engineer.build_engineer_subgraph.cache_clear()
+    assert engineer.build_engineer_subgraph() is not first
+
+
+def test_routers_read_dict_and_model_metadata():
+    working = {"jules_metadata": {"status": "WORKING"}}
+    blocked = {"jules_metadata": JulesMetadata(status="BLOCKED")}
+    done = {"jules_metadata": JulesMetadata(status="COMPLETED").model_dump(mode="json")}
+    tunneling = {"jules_metadata": {"status": "COMPLETED", "cognitive_tunneling_detected": True}}
+
+    assert engineer.route_watch_tower(working) == "watch_tower"
+    assert engineer.route_watch_tower(blocked) == "interrupt_human"
+    assert engineer.route_watch_tower(done) == "entropy_guard"
+    assert engineer.route_entropy_guard(done) == "architect_gate"
+    assert engineer.route_entropy_guard(tunneling) == "feedback_loop"
+    assert engineer.route_architect_gate(done) == "end"
+    assert engineer.route_feedback_loop(working) == "task_dispatcher"
+    assert engineer.route_feedback_loop({"jules_metadata": {}}) == "task_dispatcher"
+    assert engineer.route_feedback_loop(done) == "end"
+
+
+def test_dispatcher_always_passes_through_entropy_guard():
+    # The guard measures the task prompt itself, so it must run even without artifacts
+    edges = {(e.source, e.target): e.conditional for e in engineer.build_engineer_subgraph().get_graph().edges}
+    assert edges[("task_dispatcher", "entropy_guard")] is False
+    assert ("task_dispatcher", "architect_gate") not in edges
+
+
+@patch("studio.subgraphs.engineer.JulesGitHubClient")
+def test_jules_client_is_shared(mock_client_cls):
+    assert engineer.get_jules_client() is engineer.get_jules_client()
+    mock_client_cls.assert_called_once()
+
+
+@pytest.mark.asyncio
+@patch("studio.subgraphs.engineer.JulesGitHubClient")
+async def test_feedback_loop_posts_off_the_event_loop(mock_client_cls):
+    import threading
+    loop_thread = threading.get_ident()
+    calling_threads = []
+
+    mock_client = MagicMock()
+    mock_client.post_feedback.side_effect = lambda *a, **kw: calling_threads.append(threading.get_ident())
+    mock_client_cls.return_value = mock_client
+
+    meta = JulesMetadata(session_id="s1", external_task_id="7", status="FAILED")
+    result = await engineer.node_feedback_loop({"messages": [], "jules_metadata": meta.model_dump(mode="json")})
+
+    assert JulesMetadata(**result["jules_metadata"]).status == "WORKING"
+    mock_client.post_feedback.assert_called_once()
+    assert calling_threads and calling_threads[0] != loop_thread
+
+
+@pytest.mark.asyncio
+async def test_entropy_guard_reuses_reading_for_unchanged_artifact(monkeypatch):
+    from unittest.mock import AsyncMock
+    from studio.memory import SemanticHealthMetric
+
+    calculator = MagicMock()
+    calculator.measure_uncertainty = AsyncMock(return_value=SemanticHealthMetric(
+        entropy_score=1.2, threshold=7.0, sample_size=5, is_tunneling=False, cluster_distribution={}
+    ))
+    monkeypatch.setattr(engineer, "_get_calculator", AsyncMock(return_value=calculator))
+
+    artifact = CodeChangeArtifact(diff_content="--- a/x.py\n+++ b/x.py\n", commit_message="c")
+    meta = JulesMetadata(session_id="s1", current_task_prompt="do it", generated_artifacts=[artifact])
+
+    first = await engineer.node_entropy_guard({"jules_metadata": meta.model_dump(mode="json")})
+    second = await engineer.node_entropy_guard({"jules_metadata": first["jules_metadata"]})
+
+    assert calculator.measure_uncertainty.await_count == 1
+    assert JulesMetadata(**second["jules_metadata"]).current_entropy == 1.2
+    assert len(JulesMetadata(**second["jules_metadata"]).entropy_history) == 1
+
+    # A new diff invalidates the cached reading
+    changed = JulesMetadata(**second["jules_metadata"])
+    changed.generated_artifacts[0].diff_content += "+y = 1\n"
+    await engineer.node_entropy_guard({"jules_metadata": changed.model_dump(mode="json")})
+    assert calculator.measure_uncertainty.await_count == 2
@@ -1,6 +1,7 @@
 import pytest
 import asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
+import numpy as np
 from studio.utils.entropy_math import SemanticEntropyCalculator, VertexFlashJudge
 
 class MockJudge:
@@ -98,11 +99,16 @@ async def test_vertex_flash_judge():
 
     judge = VertexFlashJudge(mock_model)
 
-    # Test generate_samples
+    # Test generate_samples (single request with candidate_count)
+    candidate = MagicMock()
+    candidate.content.parts = [MagicMock(text="Generated Text")]
+    mock_response.candidates = [candidate, candidate]
     samples = await judge.generate_samples("Prompt", n=2)
     assert len(samples) == 2
     assert samples[0] == "Generated Text"
-    assert mock_model.generate_content_async.call_count == 2
+    assert mock_model.generate_content_async.call_count == 1
+    config = mock_model.generate_content_async.call_args.kwargs["generation_config"]
+    assert config["candidate_count"] == 2
 
     # Test check_entailment
     mock_response.text = "TRUE"
@@ -114,3 +120,237 @@ async def test_vertex_flash_judge():
     mock_response.text = "FALSE"
     result = await judge.check_entailment("A", "B", "Context")
     assert result is False
+
+    # Only the leading verdict counts
+    mock_response.text = "**True**"
+    assert await judge.check_entailment("A", "B", "Context") is True
+    mock_response.text = "FALSE, it is not TRUE that A implies B"
+    assert await judge.check_entailment("A", "B", "Context") is False
+
+@pytest.mark.asyncio
+async def test_vertex_flash_judge_falls_back_without_candidate_count():
+    # Model ignores candidate_count and returns a single candidate
+    mock_model = AsyncMock()
+    mock_response = MagicMock()
+    mock_response.text = "Generated Text"
+    candidate = MagicMock()
+    candidate.content.parts = [MagicMock(text="Generated Text")]
+    mock_response.candidates = [candidate]
+    mock_model.generate_content_async.return_value = mock_response
+
+    judge = VertexFlashJudge(mock_model)
+    samples = await judge.generate_samples("Prompt", n=3)
+
+    assert samples == ["Generated Text"] * 3
+    # 1 batched attempt + 3 parallel fallback calls
+    assert mock_model.generate_content_async.call_count == 4
+
+class EmbeddingJudge(MockJudge):
+    def __init__(self, samples, vectors, entailment_map=None):
+        super().__init__(samples=samples, entailment_map=entailment_map)
+        self.vectors = vectors
+        self.entailment_calls = 0
+
+    async def embed_samples(self, samples):
+        return np.array([self.vectors[s] for s in samples])
+
+    async def check_entailment(self, text_a, text_b, context):
+        self.entailment_calls += 1
+        return await super().check_entailment(text_a, text_b, context)
+
+@pytest.mark.asyncio
+async def test_embedding_clustering_skips_entailment_for_dissimilar_pairs():
+    samples = ["Answer A", "Answer A2", "Answer B", "Answer B", "Answer A"]
+    vectors = {"Answer A": [1.0, 0.0], "Answer A2": [0.99, 0.05], "Answer B": [0.0, 1.0]}
+    judge = EmbeddingJudge(samples, vectors, entailment_map={("Answer A2", "Answer A"): True})
+    calculator = SemanticEntropyCalculator(judge)
+
+    clusters = await calculator._cluster_responses(samples, "Intent")
+
+    assert sorted(len(c) for c in clusters) == [2, 3]
+    # Only A2 vs A is close enough to ask; B is never compared with A, repeats are textual
+    assert judge.entailment_calls == 1
+
+@pytest.mark.asyncio
+async def test_embedding_clustering_keeps_entailment_authoritative():
+    # Nearly identical embeddings, but the register value differs: NLI keeps them apart
+    samples = ["Set REG_CTRL to 0x1", "Set REG_CTRL to 0x3"]
+    vectors = {"Set REG_CTRL to 0x1": [1.0, 0.0], "Set REG_CTRL to 0x3": [0.999, 0.04]}
+    judge = EmbeddingJudge(samples, vectors)
+    calculator = SemanticEntropyCalculator(judge)
+
+    clusters = await calculator._cluster_responses(samples, "Intent")
+
+    assert clusters == [["Set REG_CTRL to 0x1"], ["Set REG_CTRL to 0x3"]]
+    assert judge.entailment_calls == 1
+
+@pytest.mark.asyncio
+async def test_embedding_failure_is_not_retried():
+    judge = MockJudge()
+    judge.embed_samples = AsyncMock(side_effect=RuntimeError("model not found"))
+    calculator = SemanticEntropyCalculator(judge)
+
+    for _ in range(3):
+        clusters = await calculator._cluster_responses(["A", "B"], "Intent")
+        assert clusters == [["A"], ["B"]]
+
+    judge.embed_samples.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_embedding_clustering_uses_entailment_on_borderline():
+    # cos(A, B) ~= 0.85 -> borderline, resolved by the judge
+    samples = ["Answer A", "Answer B"]
+    vectors = {"Answer A": [1.0, 0.0], "Answer B": [0.85, 0.527]}
+    judge = EmbeddingJudge(samples, vectors, entailment_map={("Answer B", "Answer A"): True})
+    calculator = SemanticEntropyCalculator(judge)
+
+    clusters = await calculator._cluster_responses(samples, "Intent")
+
+    assert clusters == [["Answer A", "Answer B"]]
+    assert judge.entailment_calls == 1
+
+@pytest.mark.asyncio
+async def test_vertex_flash_judge_without_embedding_model_returns_none():
+    judge = VertexFlashJudge(AsyncMock())
+    assert await judge.embed_samples(["A", "B"]) is None
+
+@pytest.mark.asyncio
+async def test_entailment_checks_run_concurrently():
+    in_flight = 0
+    peak = 0
+
+    class SlowJudge(MockJudge):
+        async def check_entailment(self, text_a, text_b, context):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0)
+            in_flight -= 1
+            return text_a == text_b
+
+    calculator = SemanticEntropyCalculator(SlowJudge())
+    clusters = await calculator._cluster_responses(["A", "B", "C", "D", "A"], "Intent")
+
+    assert clusters == [["A", "A"], ["B"], ["C"], ["D"]]
+    assert peak > 1
+
+def test_shannon_entropy_table_matches_formula():
+    import math
+    calculator = SemanticEntropyCalculator(MockJudge())
+    for sizes in ([5], [4, 1], [3, 2], [2, 2, 1], [1, 1, 1, 1, 1]):
+        clusters = [["x"] * n for n in sizes]
+        entropy, _ = calculator._compute_shannon_entropy(clusters, 5)
+        expected = -sum((n / 5) * math.log2(n / 5) for n in sizes)
+        assert entropy == pytest.approx(expected)
+
+def test_shannon_entropy_vectorized_for_large_n():
+    import math
+    calculator = SemanticEntropyCalculator(MockJudge())
+    sizes = [7, 5, 3, 3, 1, 1]
+    clusters = [[f"meaning {i}"] * n for i, n in enumerate(sizes)]
+
+    entropy, distribution = calculator._compute_shannon_entropy(clusters, sum(sizes))
+
+    expected = -sum((n / 20) * math.log2(n / 20) for n in sizes)
+    assert entropy == pytest.approx(expected)
+    assert sum(distribution.values()) == pytest.approx(1.0)
+    assert len(distribution) == len(sizes)
+
+@pytest.mark.asyncio
+async def test_duplicate_samples_skip_entailment_calls():
+    judge = AsyncMock()
+    judge.check_entailment.return_value = False
+    calculator = SemanticEntropyCalculator(judge)
+
+    clusters = await calculator._cluster_by_entailment(
+        ["The fix is X.", "the fix  is x.", "Different", "The fix is X."], "Intent"
+    )
+
+    assert [len(c) for c in clusters] == [3, 1]
+    # Only "Different" needed a judgement (against the single existing representative)
+    assert judge.check_entailment.await_count == 1
+
+@pytest.mark.asyncio
+async def test_check_entailment_uses_first_token_logprobs():
+    import math
+    mock_model = AsyncMock()
+    mock_response = MagicMock()
+    mock_response.text = "F"
+    top = MagicMock()
+    top.candidates = [
+        MagicMock(token="T", log_probability=math.log(0.7)),
+        MagicMock(token="F", log_probability=math.log(0.3)),
+    ]
+    mock_response.candidates = [MagicMock()]
+    mock_response.candidates[0].logprobs_result.top_candidates = [top]
+    mock_model.generate_content_async.return_value = mock_response
+
+    judge = VertexFlashJudge(mock_model)
+    assert await judge.check_entailment("A", "B", "Context") is True
+
+    config = mock_model.generate_content_async.call_args.kwargs["generation_config"]
+    assert config["max_output_tokens"] == 1
+    assert config["response_logprobs"] is True
+
+@pytest.mark.asyncio
+async def test_check_entailment_falls_back_when_logprobs_rejected():
+    mock_model = AsyncMock()
+    mock_response = MagicMock()
+    mock_response.text = "T"
+    mock_response.candidates = []
+    mock_model.generate_content_async.side_effect = [ValueError("logprobs not supported"), mock_response, mock_response]
+
+    judge = VertexFlashJudge(mock_model)
+    assert await judge.check_entailment("A", "B", "Context") is True
+    assert await judge.check_entailment("A", "B", "Context") is True
+
+    # Rejected once, then logprobs are no longer requested
+    assert mock_model.generate_content_async.call_count == 3
+    config = mock_model.generate_content_async.call_args.kwargs["generation_config"]
+    assert "response_logprobs" not in config
+
+def _empty_response():
+    # What a thinking model returns when its budget is used up before any visible token
+    response = MagicMock()
+    response.candidates = [MagicMock()]
+    response.candidates[0].logprobs_result.top_candidates = []
+    type(response).text = property(lambda self: (_ for _ in ()).throw(ValueError("Response candidate content has no parts")))
+    return response
+
+@pytest.mark.asyncio
+async def test_check_entailment_retries_uncapped_on_empty_candidate():
+    mock_model = AsyncMock()
+    answer = MagicMock()
+    answer.text = "T - both describe the same fix"
+    mock_model.generate_content_async.side_effect = [_empty_response(), answer]
+
+    judge = VertexFlashJudge(mock_model)
+    assert await judge.check_entailment("A", "B", "Context") is True
+
+    first, second = mock_model.generate_content_async.call_args_list
+    assert first.kwargs["generation_config"]["thinking_config"] == {"thinking_budget": 0}
+    assert "max_output_tokens" not in second.kwargs["generation_config"]
+
+@pytest.mark.asyncio
+async def test_check_entailment_without_any_verdict_is_not_entailed():
+    mock_model = AsyncMock()
+    mock_model.generate_content_async.side_effect = [_empty_response(), _empty_response()]
+
+    judge = VertexFlashJudge(mock_model)
+    assert await judge.check_entailment("A", "B", "Context") is False
+
+@pytest.mark.asyncio
+async def test_check_entailment_stops_one_token_requests_when_rejected():
+    mock_model = AsyncMock()
+    answer = MagicMock()
+    answer.text = "F"
+    rejected = ValueError("thinking_budget 0 is not supported by this model")
+    # With and without logprobs the capped request is rejected; then only full answers are used
+    mock_model.generate_content_async.side_effect = [rejected, rejected, answer, answer]
+
+    judge = VertexFlashJudge(mock_model)
+    assert await judge.check_entailment("A", "B", "Context") is False
+    assert await judge.check_entailment("A", "B", "Context") is False
+
+    assert mock_model.generate_content_async.call_count == 4
+    assert mock_model.generate_content_async.call_args.kwargs["generation_config"] == {"temperature": 0.0}
@@ -1,8 +1,14 @@
+import os
+import shutil
+import tempfile
 import unittest
 from unittest.mock import patch, MagicMock
 import subprocess
 from studio.utils.git_utils import checkout_pr_branch, sync_main_branch
 
+def _git(*args, cwd):
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+
 class TestGitUtils(unittest.TestCase):
     @patch("subprocess.run")
     def test_checkout_pr_branch_success(self, mock_run):
@@ -12,23 +18,44 @@ class TestGitUtils(unittest.TestCase):
         branch_name = "feat/new-api"
         checkout_pr_branch(branch_name)
 
-        # Verify the sequence of git commands
-        self.assertEqual(mock_run.call_count, 5)
-
-        # 1. git stash
-        mock_run.assert_any_call(["git", "stash"], check=False)
-
-        # 2. git fetch origin
-        mock_run.assert_any_call(["git", "fetch", "origin"], check=True)
+        # The whole sequence runs in a single process
+        self.assertEqual(mock_run.call_count, 1)
+        argv = mock_run.call_args.args[0]
+        self.assertEqual(argv[:2], ["sh", "-c"])
+        self.assertTrue(mock_run.call_args.kwargs["check"])
+
+        # The branch is passed as a positional argument, not spliced into the script
+        script = argv[2]
+        self.assertEqual(argv[-1], branch_name)
+        self.assertNotIn(branch_name, script)
+
+        # fetch (backgrounded) + stash, then checkout -> reset --hard -> clean once fetch is joined
+        steps = ["git fetch origin &", "git stash", 'wait "$fetch"', 'git checkout "$1"', 'git reset --hard "origin/$1"', "git clean -fd"]
+        positions = [script.index(step) for step in steps]
+        self.assertEqual(positions, sorted(positions))
+
+        # No credential prompts, optional locks or background maintenance
+        env = mock_run.call_args.kwargs["env"]
+        self.assertEqual(env["GIT_OPTIONAL_LOCKS"], "0")
+        self.assertEqual(env["GIT_TERMINAL_PROMPT"], "0")
+        self.assertEqual(env["GIT_CONFIG_KEY_1"], "gc.auto")
+        self.assertEqual(env["PATH"], os.environ["PATH"])
 
-        # 3. git checkout branch_name
-        mock_run.assert_any_call(["git", "checkout", branch_name], check=True)
+    @patch("subprocess.run")
+    def test_git_config_env_keeps_caller_entries(self, mock_run):
+        mock_run.return_value = MagicMock(returncode=0)
+        caller = {"GIT_CONFIG_COUNT": "1", "GIT_CONFIG_KEY_0": "http.proxy", "GIT_CONFIG_VALUE_0": "http://proxy:3128"}
 
-        # 4. git reset --hard origin/branch_name
-        mock_run.assert_any_call(["git", "reset", "--hard", f"origin/{branch_name}"], check=True)
+        with patch.dict(os.environ, caller):
+            checkout_pr_branch("feat/new-api")
 
-        # 5. git clean -fd
-        mock_run.assert_any_call(["git", "clean", "-fd"], check=True)
+        # Our overrides are appended after the caller's config instead of replacing it
+        env = mock_run.call_args.kwargs["env"]
+        self.assertEqual(env["GIT_CONFIG_COUNT"], "3")
+        self.assertEqual(env["GIT_CONFIG_KEY_0"], "http.proxy")
+        self.assertEqual(env["GIT_CONFIG_VALUE_0"], "http://proxy:3128")
+        self.assertEqual((env["GIT_CONFIG_KEY_1"], env["GIT_CONFIG_VALUE_1"]), ("core.fsmonitor", "false"))
+        self.assertEqual((env["GIT_CONFIG_KEY_2"], env["GIT_CONFIG_VALUE_2"]), ("gc.auto", "0"))
 
     @patch("subprocess.run")
     def test_sync_main_branch_success(self, mock_run):
@@ -36,53 +63,75 @@ class TestGitUtils(unittest.TestCase):
 
         sync_main_branch()
 
-        self.assertEqual(mock_run.call_count, 5)
-        # 1. git stash
-        mock_run.assert_any_call(["git", "stash"], check=False)
-        # 2. git checkout main
-        mock_run.assert_any_call(["git", "checkout", "main"], check=True)
-        # 3. git fetch origin main
-        mock_run.assert_any_call(["git", "fetch", "origin", "main"], check=True)
-        # 4. git reset --hard origin/main
-        mock_run.assert_any_call(["git", "reset", "--hard", "origin/main"], check=True)
-        # 5. git clean -fd
-        mock_run.assert_any_call(["git", "clean", "-fd"], check=True)
+        self.assertEqual(mock_run.call_count, 1)
+        script = mock_run.call_args.args[0][2]
+        steps = ["git fetch origin main &", "git stash", "git checkout main", 'wait "$fetch" &&', "git reset --hard origin/main", "git clean -fd"]
+        positions = [script.index(step) for step in steps]
+        self.assertEqual(positions, sorted(positions))
 
     @patch("subprocess.run")
-    def test_sync_main_branch_checkout_failure(self, mock_run):
-        # First call is git stash (succeeds), second is git checkout main (fails)
-        def side_effect(*args, **kwargs):
-            cmd = args[0]
-            if cmd == ["git", "checkout", "main"]:
-                raise subprocess.CalledProcessError(returncode=1, cmd=cmd)
-            return MagicMock(returncode=0)
-
-        mock_run.side_effect = side_effect
+    def test_sync_main_branch_failure(self, mock_run):
+        mock_run.side_effect = subprocess.CalledProcessError(returncode=1, cmd=["sh"])
 
         with self.assertRaises(subprocess.CalledProcessError):
             sync_main_branch()
 
-        self.assertEqual(mock_run.call_count, 2)
-        mock_run.assert_any_call(["git", "stash"], check=False)
-        mock_run.assert_any_call(["git", "checkout", "main"], check=True)
+        self.assertEqual(mock_run.call_count, 1)
 
-    @patch("subprocess.run")
-    def test_sync_main_branch_fetch_failure(self, mock_run):
-        def side_effect(*args, **kwargs):
-            cmd = args[0]
-            if "fetch" in cmd:
-                raise subprocess.CalledProcessError(returncode=1, cmd=cmd)
-            return MagicMock(returncode=0)
+@unittest.skipUnless(shutil.which("git") and shutil.which("sh"), "requires git and sh")
+class TestGitUtilsShell(unittest.TestCase):
+    """Runs the real scripts against a throwaway origin/clone pair."""
+
+    def setUp(self):
+        self._cwd = os.getcwd()
+        self.tmp = tempfile.mkdtemp()
+        origin = os.path.join(self.tmp, "origin")
+        self.clone = os.path.join(self.tmp, "clone")
+
+        _git("init", "-q", "-b", "main", origin, cwd=self.tmp)
+        _git("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-q", "--allow-empty", "-m", "base", cwd=origin)
+        _git("checkout", "-q", "-b", "feat/pr-1", cwd=origin)
+        with open(os.path.join(origin, "feature.txt"), "w") as f:
+            f.write("feature\n")
+        _git("add", "feature.txt", cwd=origin)
+        _git("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-q", "-m", "feature", cwd=origin)
+        _git("checkout", "-q", "main", cwd=origin)
+        _git("clone", "-q", origin, self.clone, cwd=self.tmp)
+        os.chdir(self.clone)
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        shutil.rmtree(self.tmp, ignore_errors=True)
 
-        mock_run.side_effect = side_effect
+    def test_checkout_then_sync_main(self):
+        open("scratch.txt", "w").close()
 
+        checkout_pr_branch("feat/pr-1")
+        self.assertTrue(os.path.exists("feature.txt"))
+        self.assertFalse(os.path.exists("scratch.txt"))
+
+        sync_main_branch()
+        self.assertFalse(os.path.exists("feature.txt"))
+
+    def test_failed_step_stops_the_sequence(self):
+        open("scratch.txt", "w").close()
+
+        with self.assertRaises(subprocess.CalledProcessError):
+            checkout_pr_branch("no-such-branch")
+
+        # clean -fd never ran
+        self.assertTrue(os.path.exists("scratch.txt"))
+
+    def test_failed_fetch_stops_the_sequence(self):
+        _git("remote", "set-url", "origin", os.path.join(self.tmp, "missing"), cwd=self.clone)
+        open("scratch.txt", "w").close()
+
+        with self.assertRaises(subprocess.CalledProcessError):
+            checkout_pr_branch("feat/pr-1")
         with self.assertRaises(subprocess.CalledProcessError):
             sync_main_branch()
 
-        self.assertEqual(mock_run.call_count, 3)
-        mock_run.assert_any_call(["git", "stash"], check=False)
-        mock_run.assert_any_call(["git", "checkout", "main"], check=True)
-        mock_run.assert_any_call(["git", "fetch", "origin", "main"], check=True)
+        self.assertTrue(os.path.exists("scratch.txt"))
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,430 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from pydantic import SecretStr
+from studio.utils.jules_client import JulesGitHubClient
+
+def _pr_node(number=7, state="OPEN", repo="owner/repo"):
+    return {
+        "repository": {"nameWithOwner": repo},
+        "number": number,
+        "state": state,
+        "url": f"https://github.com/{repo}/pull/{number}",
+        "headRefName": "jules/fix",
+        "headRefOid": "abc123",
+        "additions": 3,
+        "deletions": 1,
+    }
+
+def _status_response(issue_state="OPEN", sources=(), end_cursor=None):
+    nodes = [{"source": source} for source in sources]
+    page_info = {"hasNextPage": end_cursor is not None, "endCursor": end_cursor}
+    timeline = {"pageInfo": page_info, "nodes": nodes}
+    return {}, {"data": {"repository": {"issue": {"state": issue_state, "timelineItems": timeline}}}}
+
+@pytest.fixture
+def client():
+    with patch("studio.utils.jules_client.Github") as mock_github:
+        mock_github.return_value = MagicMock()
+        yield JulesGitHubClient(github_token=SecretStr("token"), repo_name="owner/repo")
+
+def test_get_status_without_linked_pr(client):
+    # Cross-referenced plain issues carry an empty source
+    client.gh.requester.graphql_query.return_value = _status_response(sources=[{}])
+
+    status = client.get_status("12")
+
+    assert status.status == "WORKING"
+    assert status.linked_pr_number is None
+    _, variables = client.gh.requester.graphql_query.call_args.args
+    assert variables == {"owner": "owner", "name": "repo", "number": 12, "after": None}
+
+def test_get_status_with_linked_pr_uses_one_query(client):
+    client.gh.requester.graphql_query.return_value = _status_response(sources=[{}, _pr_node(state="MERGED")])
+    changed = {"filename": "src/app.py", "patch": "@@ -1 +1 @@\n-old\n+new"}
+
+    with patch.object(client, "_iter_pr_files", return_value=iter([changed])) as mock_files:
+        status = client.get_status("12")
+
+    mock_files.assert_called_once_with(7)
+    client.gh.requester.graphql_query.assert_called_once()
+    client.gh.get_repo.assert_not_called()
+    assert status.status == "COMPLETED"
+    assert status.linked_pr_number == 7
+    assert status.branch_name == "jules/fix"
+    assert status.last_commit_hash == "abc123"
+    assert status.diff_stat == "+3/-1"
+    assert status.raw_diff == "--- a/src/app.py\n+++ b/src/app.py\n@@ -1 +1 @@\n-old\n+new\n"
+
+def test_get_status_blocked_on_github_error(client):
+    from github.GithubException import GithubException
+    client.gh.requester.graphql_query.side_effect = GithubException(502, "bad gateway", None)
+    client.gh.get_repo.return_value.get_issue.side_effect = GithubException(502, "bad gateway", None)
+
+    assert client.get_status("12").status == "BLOCKED"
+
+def test_get_status_pages_timeline_until_pr_found(client):
+    client.gh.requester.graphql_query.side_effect = [
+        _status_response(sources=[{}] * 100, end_cursor="c1"),
+        _status_response(sources=[{}, _pr_node(number=9)], end_cursor="c2"),
+    ]
+
+    with patch.object(client, "_iter_pr_files", return_value=iter([])):
+        status = client.get_status("12")
+
+    assert status.linked_pr_number == 9
+    # The page holding the PR ends the walk even though more pages remain
+    afters = [call.args[1]["after"] for call in client.gh.requester.graphql_query.call_args_list]
+    assert afters == [None, "c1"]
+
+def _cross_reference(number, repo="owner/repo"):
+    event = MagicMock(event="cross-referenced")
+    event.source.issue.number = number
+    event.source.issue.repository.full_name = repo
+    return event
+
+def _rest_timeline(client, pr_number=9):
+    plain = MagicMock(event="cross-referenced")
+    plain.source.issue.pull_request = None
+    # A PR in another repository that mentions the issue is not ours
+    foreign = _cross_reference(3, repo="someone/fork")
+    repo = client.gh.get_repo.return_value
+    repo.get_issue.return_value.state = "open"
+    repo.get_issue.return_value.get_timeline.return_value = [
+        MagicMock(event="labeled"), plain, foreign, _cross_reference(pr_number, repo="Owner/Repo")
+    ]
+    pr = repo.get_pull.return_value
+    pr.configure_mock(number=pr_number, state="closed", merged=True, html_url="https://github.com/owner/repo/pull/9",
+                      additions=3, deletions=1)
+    pr.head.ref, pr.head.sha = "jules/fix", "abc123"
+    return repo
+
+@pytest.mark.parametrize("graphql_outcome", [
+    "raise",
+    {"data": None, "errors": [{"type": "RATE_LIMITED", "message": "API rate limit exceeded"}]},
+])
+def test_get_status_falls_back_to_rest_when_graphql_fails(client, graphql_outcome):
+    from github.GithubException import GithubException
+    if graphql_outcome == "raise":
+        client.gh.requester.graphql_query.side_effect = GithubException(502, "bad gateway", None)
+    else:
+        client.gh.requester.graphql_query.return_value = ({}, graphql_outcome)
+    repo = _rest_timeline(client)
+
+    with patch.object(client, "_iter_pr_files", return_value=iter([])) as mock_files:
+        status = client.get_status("12")
+
+    repo.get_issue.assert_called_once_with(12)
+    repo.get_pull.assert_called_once_with(9)
+    mock_files.assert_called_once_with(9)
+    assert status.status == "COMPLETED"
+    assert status.linked_pr_number == 9
+    assert status.branch_name == "jules/fix"
+    assert status.last_commit_hash == "abc123"
+    assert status.diff_stat == "+3/-1"
+
+def test_get_status_rest_fallback_sees_issue_closed_after_comment(client):
+    from github.GithubException import GithubException
+    client.gh.requester.graphql_query.side_effect = GithubException(502, "bad gateway", None)
+    repo = client.gh.get_repo.return_value
+    opened, closed = MagicMock(state="open"), MagicMock(state="closed")
+    opened.get_timeline.return_value = closed.get_timeline.return_value = []
+    repo.get_issue.side_effect = [opened, closed]
+
+    # Commenting caches the issue handle while it is still open
+    with patch.object(client, "_find_linked_pr", return_value=None):
+        assert client.post_feedback("12", "fix it")
+    opened.create_comment.assert_called_once()
+
+    assert client.get_status("12").status == "BLOCKED"
+    assert repo.get_issue.call_count == 2
+
+def test_get_status_rest_fallback_without_linked_pr(client):
+    from github.GithubException import GithubException
+    client.gh.requester.graphql_query.side_effect = GithubException(502, "bad gateway", None)
+    repo = client.gh.get_repo.return_value
+    repo.get_issue.return_value.state = "closed"
+    repo.get_issue.return_value.get_timeline.return_value = [MagicMock(event="labeled")]
+
+    status = client.get_status("12")
+
+    assert status.status == "BLOCKED"
+    assert status.linked_pr_number is None
+    repo.get_pull.assert_not_called()
+
+def test_get_status_skips_prs_from_other_repositories(client):
+    client.gh.requester.graphql_query.return_value = _status_response(
+        sources=[_pr_node(number=3, repo="someone/fork"), _pr_node(number=9, repo="Owner/Repo")]
+    )
+
+    with patch.object(client, "_iter_pr_files", return_value=iter([])) as mock_files:
+        status = client.get_status("12")
+
+    mock_files.assert_called_once_with(9)
+    assert status.linked_pr_number == 9
+
+def test_get_status_is_cached_within_ttl(client):
+    client.gh.requester.graphql_query.return_value = _status_response()
+
+    first = client.get_status("12")
+    second = client.get_status("12")
+    assert second is first
+    assert client.gh.requester.graphql_query.call_count == 1
+
+    client.get_status("12", force=True)
+    assert client.gh.requester.graphql_query.call_count == 2
+
+    client._status_ttl = 0.0
+    client.get_status("12")
+    assert client.gh.requester.graphql_query.call_count == 3
+
+def test_get_status_errors_are_not_cached(client):
+    from github.GithubException import GithubException
+    client.gh.requester.graphql_query.side_effect = [GithubException(502, "bad gateway", None), _status_response()]
+    client.gh.get_repo.return_value.get_issue.side_effect = GithubException(502, "bad gateway", None)
+
+    assert client.get_status("12").status == "BLOCKED"
+    assert client.get_status("12").status == "WORKING"
+
+def test_post_feedback_reuses_issue_lookup(client):
+    with patch.object(client, "_find_linked_pr", return_value=None):
+        assert client.post_feedback("12", "fix it")
+        assert client.post_feedback("12", "fix it again")
+
+    client.gh.get_repo.return_value.get_issue.assert_called_once_with(12)
+    assert client.gh.get_repo.return_value.get_issue.return_value.create_comment.call_count == 2
+
+def test_pr_files_use_conditional_requests(client):
+    files = [{"filename": "a.py", "patch": "+x"}]
+    requester = client.gh.requester
+    requester.requestJson.side_effect = [
+        (200, {"etag": 'W/"v1"'}, '[{"filename": "a.py", "patch": "+x"}]'),
+        (304, {"etag": 'W/"v1"'}, ""),
+    ]
+
+    assert list(client._iter_pr_files(7)) == files
+    assert list(client._iter_pr_files(7)) == files
+
+    first, second = requester.requestJson.call_args_list
+    assert first.args[:2] == ("GET", "/repos/owner/repo/pulls/7/files")
+    assert first.args[3] is None
+    assert second.args[3] == {"If-None-Match": 'W/"v1"'}
+
+def test_pr_files_fetches_remaining_pages_from_link_header(client):
+    import json
+    pages = {
+        1: [{"filename": f"f{i}.py", "patch": "+x"} for i in range(100)],
+        2: [{"filename": f"g{i}.py", "patch": "+x"} for i in range(100)],
+        3: [{"filename": "h.py", "patch": "+x"}],
+    }
+    link = '<https://api.github.com/repositories/1/pulls/7/files?per_page=100&page=2>; rel="next", ' \
+           '<https://api.github.com/repositories/1/pulls/7/files?per_page=100&page=3>; rel="last"'
+
+    def request(verb, url, parameters, headers):
+        page = parameters["page"]
+        return 200, {"link": link} if page == 1 else {}, json.dumps(pages[page])
+
+    client.gh.requester.requestJson.side_effect = request
+
+    files = list(client._iter_pr_files(7))
+
+    # Order is preserved even though pages 2..3 are fetched concurrently
+    assert [f["filename"] for f in files] == [f["filename"] for p in (1, 2, 3) for f in pages[p]]
+    assert client.gh.requester.requestJson.call_count == 3
+
+def test_conditional_get_raises_on_error(client):
+    from github.GithubException import GithubException
+    client.gh.requester.requestJson.return_value = (404, {}, '{"message": "Not Found"}')
+
+    with pytest.raises(GithubException):
+        list(client._iter_pr_files(7))
+
+def test_fix_patch_prefixes_bare_context_lines():
+    from studio.utils.jules_client import _fix_patch
+
+    def reference(patch):
+        fixed = []
+        for line in patch.splitlines():
+            if line.startswith(('+', '-', '@@', '\\', ' ')):
+                fixed.append(line)
+            elif not line:
+                fixed.append(' ')
+            else:
+                fixed.append(' ' + line)
+        return "\n".join(fixed) + "\n"
+
+    patch = "@@ -1,4 +1,4 @@\ndef f():\n\n-    return 1\n+    return 2\n @ok\n@decorator\n\\ No newline at end of file\n"
+    assert _fix_patch(patch) == reference(patch)
+    assert _fix_patch(patch).splitlines()[1:3] == [" def f():", " "]
+    assert _fix_patch("\n") == reference("\n") == " \n"
+
+def test_raw_diff_is_capped_without_fetching_more_pages(client, monkeypatch):
+    import json
+    monkeypatch.setattr("studio.utils.jules_client.MAX_RAW_DIFF_CHARS", 200)
+    big = "\n".join(f"+line {i}" for i in range(50))
+    page = [{"filename": f"f{i}.py", "patch": big} for i in range(100)]
+    link = '<https://api.github.com/repositories/1/pulls/7/files?page=5>; rel="last"'
+    client.gh.requester.requestJson.return_value = (200, {"link": link}, json.dumps(page))
+
+    diff = client._build_raw_diff(7)
+
+    assert len(diff) <= 200
+    assert diff.startswith("--- a/f0.py\n+++ b/f0.py\n+line 0\n")
+    assert diff.endswith("\n")
+    # Only the first page was requested
+    assert client.gh.requester.requestJson.call_count == 1
+
+def test_raw_diff_cap_on_later_page_stops_requesting_pages(client, monkeypatch):
+    import json
+    monkeypatch.setattr("studio.utils.jules_client._MAX_PAGE_WORKERS", 2)
+    part = "+x\n" * 10
+    # Each file renders to ~60 chars, each page to ~6000: the cap falls inside page 2
+    monkeypatch.setattr("studio.utils.jules_client.MAX_RAW_DIFF_CHARS", 9000)
+    link = '<https://api.github.com/repositories/1/pulls/7/files?page=6>; rel="last"'
+    requested = []
+
+    def request(verb, url, parameters, headers):
+        page = parameters["page"]
+        requested.append(page)
+        files = [{"filename": f"p{page}_{i}.py", "patch": part} for i in range(100)]
+        return 200, {"link": link} if page == 1 else {}, json.dumps(files)
+
+    client.gh.requester.requestJson.side_effect = request
+
+    diff = client._build_raw_diff(7)
+
+    assert len(diff) <= 9000
+    assert "p2_" in diff and "p3_" not in diff
+    # Only the in-flight window (pages 2-3) went out after page 1; pages 4-6 never did
+    assert sorted(requested) in ([1, 2], [1, 2, 3])
+
+def test_post_feedback_comments_on_linked_pr(client):
+    client.gh.requester.graphql_query.return_value = _status_response(sources=[_pr_node(number=9)])
+    repo = client.gh.get_repo.return_value
+
+    assert client.post_feedback("12", "fix it", is_error=True)
+
+    repo.get_pull.assert_called_once_with(9)
+    repo.get_issue.assert_not_called()
+    body = repo.get_pull.return_value.create_issue_comment.call_args.args[0]
+    assert body.startswith("@google-jules\n### ❌ QA Verification Failed")
+
+def test_linked_pr_is_looked_up_once_per_issue(client):
+    client.gh.requester.graphql_query.side_effect = [
+        _status_response(sources=[]),
+        _status_response(sources=[_pr_node(number=9)]),
+    ]
+    repo = client.gh.get_repo.return_value
+
+    # Not linked yet: misses are not cached
+    assert client._find_linked_pr(12) is None
+    assert client._find_linked_pr(12) is repo.get_pull.return_value
+    assert client._find_linked_pr(12) is repo.get_pull.return_value
+
+    assert client.gh.requester.graphql_query.call_count == 2
+    repo.get_pull.assert_called_once_with(9)
+
+def test_linked_pr_ignores_and_does_not_cache_other_repositories(client):
+    client.gh.requester.graphql_query.side_effect = [
+        _status_response(sources=[_pr_node(number=3, repo="someone/fork")]),
+        _status_response(sources=[_pr_node(number=3, repo="someone/fork"), _pr_node(number=9)]),
+    ]
+    repo = client.gh.get_repo.return_value
+
+    assert client._find_linked_pr(12) is None
+    repo.get_pull.assert_not_called()
+
+    assert client._find_linked_pr(12) is repo.get_pull.return_value
+    assert client._find_linked_pr(12) is repo.get_pull.return_value
+    repo.get_pull.assert_called_once_with(9)
+
+def test_repo_is_resolved_once(client):
+    from github.GithubException import GithubException
+    client.gh.get_repo.side_effect = [GithubException(502, "bad gateway", None), MagicMock()]
+
+    # Failures are not cached
+    with pytest.raises(GithubException):
+        client.repo
+
+    repo = client.repo
+    assert client.repo is repo
+    assert client.gh.get_repo.call_count == 2
+
+def test_page_workers_use_their_own_sessions():
+    import json
+    import threading
+    main_gh = MagicMock()
+    worker_ghs = []
+
+    def make_github(*args, **kwargs):
+        if not kwargs.get("pool_size"):
+            return main_gh
+        gh = MagicMock()
+        gh.requester.requestJson.return_value = (200, {}, json.dumps([{"filename": "later.py"}]))
+        gh.thread = threading.get_ident()
+        worker_ghs.append(gh)
+        return gh
+
+    link = '<https://api.github.com/repositories/1/pulls/7/files?page=3>; rel="last"'
+    main_gh.requester.requestJson.return_value = (200, {"link": link}, json.dumps([{"filename": "first.py"}]))
+
+    with patch("studio.utils.jules_client.Github", side_effect=make_github):
+        client = JulesGitHubClient(github_token=SecretStr("token"), repo_name="owner/repo")
+        files = list(client._iter_pr_files(7))
+        list(client._iter_pr_files(7))
+
+    assert [f["filename"] for f in files] == ["first.py", "later.py", "later.py"]
+    # Only page 1 goes through the shared requester
+    assert main_gh.requester.requestJson.call_count == 2
+    # Each worker thread built one session and kept it across polls
+    assert worker_ghs
+    assert len({gh.thread for gh in worker_ghs}) == len(worker_ghs)
+    assert sum(gh.requester.requestJson.call_count for gh in worker_ghs) == 4
+
+def test_issue_body_lists_files_constraints_and_logs(client):
+    from studio.utils.jules_client import TaskPayload
+    payload = TaskPayload(
+        task_id="TKT-1",
+        intent="Fix {braces} in parser",
+        context_files={"src/parser.py": "Context file"},
+        constraints=["Follow TDD"],
+    )
+
+    body = client._construct_issue_body(payload)
+
+    assert body.startswith("\n@google-jules **Action Required**\n")
+    assert "### 🎯 Intent\nFix {braces} in parser\n" in body
+    assert "* **Task ID:** `TKT-1`" in body
+    assert "- `src/parser.py`: Context file" in body
+    assert "- [ ] Follow TDD" in body
+    assert "```text\nNo logs provided.\n\n```" in body
+
+def test_get_file_text_uses_raw_media_type(client):
+    client.gh.requester.requestJson.return_value = (200, {}, "print('hi')\n")
+
+    assert client._get_file_text("src/my file.py", ref="abc") == "print('hi')\n"
+
+    verb, url, parameters, headers = client.gh.requester.requestJson.call_args.args
+    assert (verb, url) == ("GET", "/repos/owner/repo/contents/src/my%20file.py")
+    assert parameters == {"ref": "abc"}
+    assert headers["Accept"] == "application/vnd.github.raw+json"
+
+def test_get_file_text_raises_for_missing_file(client):
+    from github.GithubException import GithubException
+    client.gh.requester.requestJson.return_value = (404, {}, '{"message": "Not Found"}')
+
+    with pytest.raises(GithubException):
+        client._get_file_text("new.py", ref="abc")
+
+def test_completed_status_is_kept_without_further_calls(client):
+    client.gh.requester.graphql_query.return_value = _status_response(sources=[_pr_node(state="MERGED")])
+    client._status_ttl = 0.0
+
+    with patch.object(client, "_iter_pr_files", return_value=iter([])):
+        first = client.get_status("12")
+        assert first.status == "COMPLETED"
+        assert client.get_status("12") is first
+        assert client.gh.requester.graphql_query.call_count == 1
+
+        client._iter_pr_files.return_value = iter([])
+        client.get_status("12", force=True)
+        assert client.gh.requester.graphql_query.call_count == 2
@@ -137,3 +137,13 @@ def test_jules_metadata_httpurl_serialization():
 
     packed = ormsgpack.packb(dump_json)
     assert packed is not None
+
+def test_jules_metadata_feedback_log_is_bounded():
+    from studio.memory import MAX_FEEDBACK_LOG
+    entries = [f"feedback {i}" for i in range(MAX_FEEDBACK_LOG + 5)]
+
+    meta = JulesMetadata(feedback_log=entries)
+
+    assert len(meta.feedback_log) == MAX_FEEDBACK_LOG
+    assert meta.feedback_log[-1] == entries[-1]
+    assert meta.feedback_log[0] == entries[5]
@@ -106,3 +106,229 @@ line3
 """
     patched = apply_virtual_patch(files, diff)
     assert patched["app.py"] == "line1\nline2-new\nline3\n"
+
+def test_apply_patch_in_memory_without_subprocess():
+    from unittest.mock import patch as mock_patch
+    files = {"pkg/a.py": "one\ntwo\nthree\n", "pkg/b.py": "keep\n"}
+    diff = """--- a/pkg/a.py
++++ b/pkg/a.py
+@@ -2,1 +2,2 @@
+-two
++2
++2.5
+"""
+    with mock_patch("studio.utils.patching.subprocess.run") as mock_run:
+        patched = apply_virtual_patch(files, diff)
+
+    mock_run.assert_not_called()
+    assert patched == {"pkg/a.py": "one\n2\n2.5\nthree\n", "pkg/b.py": "keep\n"}
+
+def test_apply_patch_in_memory_handles_offsets_and_no_newline():
+    files = {"app.py": "header\nextra\nfirst\nlast"}
+    # Stated line numbers are off by one; the final line has no trailing newline
+    diff = """--- a/app.py
++++ b/app.py
+@@ -2,2 +2,2 @@
+ first
+-last
+\\ No newline at end of file
++final
+\\ No newline at end of file
+"""
+    patched = apply_virtual_patch(files, diff)
+    assert patched["app.py"] == "header\nextra\nfirst\nfinal"
+
+def test_apply_patch_deletes_dev_null_target():
+    files = {"old.py": "gone\n", "stay.py": "here\n"}
+    diff = """--- a/old.py
++++ /dev/null
+@@ -1,1 +0,0 @@
+-gone
+"""
+    patched = apply_virtual_patch(files, diff)
+    assert patched == {"stay.py": "here\n"}
+
+def test_apply_patch_mismatch_falls_back_to_patch_command():
+    files = {"app.py": "alpha\nbeta\ngamma\ndelta\n"}
+    # Context line "BETA" does not match exactly; patch(1) applies it with fuzz
+    diff = """--- a/app.py
++++ b/app.py
+@@ -1,4 +1,4 @@
+ alpha
+ BETA
+-gamma
++GAMMA
+ delta
+"""
+    patched = apply_virtual_patch(files, diff)
+    assert patched["app.py"] == "alpha\nbeta\nGAMMA\ndelta\n"
+
+def test_apply_patch_command_reads_back_only_patched_files():
+    files = {"app.py": "alpha\nbeta\ngamma\ndelta\n", "untouched.py": "keep\n"}
+    # Fuzzy hunk -> patch(1), which leaves an app.py.orig backup behind
+    diff = """--- a/app.py
++++ b/app.py
+@@ -1,4 +1,4 @@
+ alpha
+ BETA
+-gamma
++GAMMA
+ delta
+"""
+    patched = apply_virtual_patch(files, diff)
+    assert patched == {"app.py": "alpha\nbeta\nGAMMA\ndelta\n", "untouched.py": "keep\n"}
+
+def test_apply_patch_git_rename_uses_patch_command():
+    files = {"old.py": "a\nb\nc\n", "other.py": "keep\n"}
+    diff = """diff --git a/old.py b/new.py
+similarity index 80%
+rename from old.py
+rename to new.py
+--- a/old.py
++++ b/new.py
+@@ -1,3 +1,3 @@
+ a
+-b
++B
+ c
+"""
+    patched = apply_virtual_patch(files, diff)
+    assert patched == {"new.py": "a\nB\nc\n", "other.py": "keep\n"}
+
+def test_apply_patch_pure_git_rename():
+    files = {"old.py": "a\n"}
+    diff = """diff --git a/old.py b/new.py
+similarity index 100%
+rename from old.py
+rename to new.py
+"""
+    assert apply_virtual_patch(files, diff) == {"new.py": "a\n"}
+
+def test_apply_patch_without_files_is_rejected():
+    from unittest.mock import patch as mock_patch
+    files = {"app.py": "x\n"}
+    # Prose or a mangled diff must go back to the engineer, not pass as a no-op
+    with mock_patch("studio.utils.patching.subprocess.run") as mock_run:
+        with pytest.raises(RuntimeError, match="no file changes"):
+            apply_virtual_patch(files, "I could not produce a patch for this.\n")
+    mock_run.assert_not_called()
+    assert apply_virtual_patch(files, "  \n") == files
+
+def test_apply_patch_in_memory_keeps_form_feeds_inside_lines():
+    from unittest.mock import patch as mock_patch
+    files = {"driver.c": "int a;\n\x0c/* page 2 */\nint b;\n"}
+    diff = "--- a/driver.c\n+++ b/driver.c\n@@ -1,3 +1,3 @@\n int a;\n \x0c/* page 2 */\n-int b;\n+int c;\n"
+
+    with mock_patch("studio.utils.patching.subprocess.run") as mock_run:
+        patched = apply_virtual_patch(files, diff)
+
+    mock_run.assert_not_called()
+    assert patched["driver.c"] == "int a;\n\x0c/* page 2 */\nint c;\n"
+
+FUZZY_DIFF = """--- a/app.py
++++ b/app.py
+@@ -1,4 +1,4 @@
+ alpha
+ BETA
+-gamma
++GAMMA
+ delta
+"""
+
+def test_sandbox_pool_rewrites_only_changed_files():
+    from studio.utils.patching import SandboxPool, _Sandbox
+    files = {f"pkg/mod{i}.py": f"# {i}\n" for i in range(20)}
+    files["app.py"] = "alpha\nbeta\ngamma\ndelta\n"
+    written = []
+    original_sync = _Sandbox.sync
+
+    def counting_sync(self, workset):
+        written.append(sum(self.on_disk.get(p) != c for p, c in workset.items()))
+        original_sync(self, workset)
+
+    pool = SandboxPool(max_idle=1)
+    try:
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr(_Sandbox, "sync", counting_sync)
+            first = apply_virtual_patch(files, FUZZY_DIFF, sandbox_pool=pool)
+            second = apply_virtual_patch(files, FUZZY_DIFF, sandbox_pool=pool)
+    finally:
+        pool.close()
+
+    assert first == second
+    assert second["app.py"] == "alpha\nbeta\nGAMMA\ndelta\n"
+    # The first run writes the whole workset; the second only restores app.py
+    assert written == [21, 1]
+
+def test_sandbox_pool_recovers_after_failed_patch():
+    from studio.utils.patching import SandboxPool
+    files = {"app.py": "alpha\nbeta\ngamma\ndelta\n"}
+    bad = "--- a/app.py\n+++ b/app.py\n@@ -1,2 +1,2 @@\n-zzz\n-yyy\n+new\n+new\n"
+    pool = SandboxPool()
+    try:
+        with pytest.raises(RuntimeError):
+            apply_virtual_patch(files, bad, sandbox_pool=pool)
+        assert apply_virtual_patch(files, FUZZY_DIFF, sandbox_pool=pool) == {"app.py": "alpha\nbeta\nGAMMA\ndelta\n"}
+    finally:
+        pool.close()
+
+@pytest.mark.parametrize("files, diff", [
+    # LF diff against a CRLF file: context must match exactly, line endings included
+    ({"a.py": "x\r\ny\r\n"}, "--- a/a.py\n+++ b/a.py\n@@ -1,2 +1,2 @@\n x\n-y\n+z\n"),
+    # Creation diff for a path that already has content
+    ({"new.py": "existing\n"}, "--- /dev/null\n+++ b/new.py\n@@ -0,0 +1,1 @@\n+a\n"),
+    # Deletion diff that only removes part of the file
+    ({"d.py": "x\ny\n"}, "--- a/d.py\n+++ /dev/null\n@@ -1,1 +0,0 @@\n-x\n"),
+])
+def test_apply_patch_rejects_what_patch_command_rejects(files, diff):
+    from studio.utils.patching import PatchApplyError, _apply_patch_set, _parse_patch
+
+    with pytest.raises(PatchApplyError):
+        _apply_patch_set(files, _parse_patch(diff))
+    # The fallback to patch(1) refuses these too, instead of returning wrong content
+    with pytest.raises(RuntimeError):
+        apply_virtual_patch(files, diff)
+
+def test_apply_patch_in_memory_keeps_crlf_context():
+    from unittest.mock import patch as mock_patch
+    files = {"a.py": "x\r\ny\r\n"}
+    diff = "--- a/a.py\n+++ b/a.py\n@@ -1,2 +1,2 @@\n x\r\n-y\r\n+z\r\n"
+
+    with mock_patch("studio.utils.patching.subprocess.run") as mock_run:
+        patched = apply_virtual_patch(files, diff)
+
+    mock_run.assert_not_called()
+    assert patched == {"a.py": "x\r\nz\r\n"}
+
+_BLK = "p\nq\nr\ns\nt\nu\n"
+
+@pytest.mark.parametrize("original, diff, expected", [
+    # The stated position is equally far from both copies of the context: forward wins
+    (_BLK + "m1\nm2\nm3\nm4\n" + _BLK,
+     "--- a/m.py\n+++ b/m.py\n@@ -6,6 +6,7 @@\n p\n q\n r\n+X\n s\n t\n u\n",
+     _BLK + "m1\nm2\nm3\nm4\n" + "p\nq\nr\nX\ns\nt\nu\n"),
+    # Less trailing than leading context anchors the hunk to the end of the file
+    ("a\nc\nb\nc\na\nb\nb\nc\na\nb\n",
+     "--- a/m.py\n+++ b/m.py\n@@ -1,3 +1,4 @@\n c\n a\n+X\n b\n",
+     "a\nc\nb\nc\na\nb\nb\nc\na\nX\nb\n"),
+])
+def test_apply_patch_in_memory_places_hunks_like_patch_command(tmp_path, original, diff, expected):
+    import shutil
+    import subprocess
+    from studio.utils.patching import _apply_patch_set, _parse_patch
+
+    assert _apply_patch_set({"m.py": original}, _parse_patch(diff))["m.py"] == expected
+    if shutil.which("patch"):
+        (tmp_path / "m.py").write_text(original)
+        subprocess.run(["patch", "-p1", "--quiet"], input=diff, text=True, cwd=tmp_path, check=True)
+        assert (tmp_path / "m.py").read_text() == expected
+
+def test_apply_patch_leaves_overlapping_hunks_to_patch_command():
+    from studio.utils.patching import PatchApplyError, _apply_patch_set, _parse_patch
+    files = {"m.py": "b\nb\nb\na\nb\na\na\nb\nc\na\nb\nb\na\n"}
+    # patch(1) matches the second hunk inside the first one's trailing context
+    diff = "--- a/m.py\n+++ b/m.py\n@@ -1,5 +1,5 @@\n b\n-b\n+X\n b\n a\n b\n@@ -8,2 +9,3 @@\n b\n+X\n a\n"
+
+    with pytest.raises(PatchApplyError):
+        _apply_patch_set(files, _parse_patch(diff))
+    assert apply_virtual_patch(files, diff)["m.py"] == "b\nX\nb\na\nb\nX\na\na\nb\nc\na\nb\nb\na\n"
@@ -0,0 +1,48 @@
+import json
+import os
+import pytest
+from unittest.mock import patch
+from studio.utils import prompts
+from studio.utils.prompts import fetch_system_prompt, update_system_prompt
+
+@pytest.fixture
+def prompts_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("product/prompts")
+    monkeypatch.setattr(prompts, "_prompts_stamp", None)
+    return tmp_path
+
+def test_fetch_falls_back_to_defaults(prompts_dir):
+    assert fetch_system_prompt("engineer") == prompts.DEFAULT_PROMPTS["engineer"]
+    assert fetch_system_prompt("unknown") == "You are a helpful AI assistant."
+
+def test_fetch_reads_file_once_until_it_changes(prompts_dir):
+    with open(prompts.PROMPTS_JSON, "w") as f:
+        json.dump({"engineer": "learned v1"}, f)
+
+    with patch("studio.utils.prompts._json_loads", wraps=prompts._json_loads) as mock_load:
+        assert fetch_system_prompt("engineer") == "learned v1"
+        assert fetch_system_prompt("engineer") == "learned v1"
+        assert mock_load.call_count == 1
+
+        with open(prompts.PROMPTS_JSON, "w") as f:
+            json.dump({"engineer": "learned v2 (edited)"}, f)
+        assert fetch_system_prompt("engineer") == "learned v2 (edited)"
+        assert mock_load.call_count == 2
+
+def test_update_invalidates_cache(prompts_dir):
+    with open(prompts.PROMPTS_JSON, "w") as f:
+        json.dump({"engineer": "v1"}, f)
+    assert fetch_system_prompt("engineer") == "v1"
+
+    with patch("studio.utils.prompts.verify_write_permission"):
+        # Same length as "v1": only the explicit invalidation guarantees a reload
+        update_system_prompt("engineer", "v2")
+
+    assert fetch_system_prompt("engineer") == "v2"
+
+def test_fetch_survives_corrupt_file(prompts_dir):
+    with open(prompts.PROMPTS_JSON, "w") as f:
+        f.write("{not json")
+
+    assert fetch_system_prompt("engineer") == prompts.DEFAULT_PROMPTS["engineer"]
@@ -0,0 +1,16 @@
+import json
+from studio.qa_agent import QAAgent
+
+def test_run_suite_tolerates_non_utf8_output(tmp_path):
+    (tmp_path / "test_ok.py").write_text("def test_ok():\n    assert True\n")
+    # Raw bytes written after pytest's own capture has ended
+    (tmp_path / "conftest.py").write_text(
+        "import os\n"
+        "def pytest_unconfigure(config):\n"
+        "    os.write(1, b'binary noise: \\xff\\xfe\\n')\n"
+    )
+
+    result = json.loads(QAAgent().run_suite(str(tmp_path)))
+
+    assert result["status"] == "PASS"
+    assert "binary noise: ��" in result["logs"]
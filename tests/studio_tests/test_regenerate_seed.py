@@ -1,41 +1,56 @@
-from unittest.mock import patch, mock_open
 import json
-from studio.utils.regenerate_seed import generate_seed
+import os
+import pytest
+from unittest.mock import patch
+from studio.utils.regenerate_seed import generate_seed, SEED_PATHS
 from studio.memory import StudioState, OrchestrationState, EngineeringState, VerificationGate
 
-def test_generate_seed():
+@pytest.fixture
+def seed_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("studio")
+    return tmp_path
+
+def test_generate_seed(seed_dir):
     """
     Tests that generate_seed creates the correct StudioState and writes it
     to both studio_state.seed.json and studio/studio_state.seed.json
     with the correct JSON formatting.
     """
-    with patch("builtins.open", mock_open()) as mocked_file, \
-         patch("json.dump") as mocked_json_dump:
+    generate_seed()
 
-        generate_seed()
+    # Construct the expected state to compare
+    expected_state = StudioState(
+        system_version="5.2.0",
+        orchestration=OrchestrationState(
+            session_id="SESSION-00",
+            user_intent="BOOTSTRAP"
+        ),
+        engineering=EngineeringState(
+            verification_gate=VerificationGate(status="PENDING")
+        )
+    )
+    expected_json = expected_state.model_dump(mode='json')
 
-        # Verify open was called twice with correct paths
-        assert mocked_file.call_count == 2
-        mocked_file.assert_any_call("studio_state.seed.json", "w")
-        mocked_file.assert_any_call("studio/studio_state.seed.json", "w")
+    assert SEED_PATHS == ("studio_state.seed.json", "studio/studio_state.seed.json")
+    for path in SEED_PATHS:
+        with open(path, "rb") as f:
+            payload = f.read()
+        assert json.loads(payload) == expected_json
+        # Formatted like json.dump(..., indent=2)
+        assert payload == json.dumps(expected_json, indent=2).encode("utf-8")
+        assert not os.path.exists(f"{path}.tmp")
 
-        # Construct the expected state to compare
-        expected_state = StudioState(
-            system_version="5.2.0",
-            orchestration=OrchestrationState(
-                session_id="SESSION-00",
-                user_intent="BOOTSTRAP"
-            ),
-            engineering=EngineeringState(
-                verification_gate=VerificationGate(status="PENDING")
-            )
-        )
-        expected_json = expected_state.model_dump(mode='json')
+def test_generate_seed_skips_unchanged_files(seed_dir):
+    generate_seed()
+
+    with patch("studio.utils.regenerate_seed.os.replace") as mock_replace:
+        generate_seed()
+    mock_replace.assert_not_called()
 
-        # Verify json.dump was called twice with correct arguments
-        assert mocked_json_dump.call_count == 2
-        for call_args in mocked_json_dump.call_args_list:
-            args, kwargs = call_args
-            assert args[0] == expected_json
-            # args[1] is the mock file object
-            assert kwargs == {"indent": 2}
+    # A stale seed is rewritten
+    with open(SEED_PATHS[1], "w") as f:
+        f.write("{}")
+    generate_seed()
+    with open(SEED_PATHS[1], "rb") as f, open(SEED_PATHS[0], "rb") as g:
+        assert f.read() == g.read()
@@ -98,3 +98,24 @@ async def test_graph_topology_rewiring(mock_gen_model, mock_vertex_judge):
     # This is harder to check directly on the builder without internal knowledge,
     # but we can try to find them.
     # Alternatively, we can run a mock state through the graph and see where it goes.
+
+@pytest.mark.asyncio
+@patch("studio.orchestrator.VertexFlashJudge")
+@patch("studio.orchestrator.GenerativeModel")
+@patch("studio.orchestrator.run_po_cycle")
+async def test_node_product_owner_passes_only_ticket_lists(mock_po_cycle, mock_gen_model, mock_vertex_judge):
+    """
+    The PO helper only needs the ticket lists, so the engineering layer is not dumped.
+    """
+    mock_po_cycle.return_value = []
+    existing = Ticket(id="TKT-1", title="Task 1", description="Desc 1", priority="HIGH", source_section_id="1")
+    orch_state = OrchestrationState(session_id="test_session", user_intent="SPRINT", task_queue=[existing])
+    state = StudioState(orchestration=orch_state, engineering=EngineeringState(proposed_patch="--- a/x.py"))
+
+    orchestrator = Orchestrator()
+    await orchestrator.node_product_owner(state)
+
+    state_dict = mock_po_cycle.call_args.args[0]
+    assert set(state_dict) == {"orchestration"}
+    assert state_dict["orchestration"]["task_queue"][0]["id"] == "TKT-1"
+    assert "full_logs" not in state_dict["orchestration"]